@@ -2,245 +2,1067 @@
 # Convert First Order Logic (FOL) formula to CNF
 # ---------------------------------------------
 
-import itertools
+import functools
+import multiprocessing
+import re
+import weakref
 
 # --------- FOL Expression Classes ----------
 
-class Var:
-    def __init__(self, name):
-        self.name = name
+class Node:
+    """Base of all terms and formulas: immutable, __slots__-based, hash-consed.
+
+    Building a node with the same type and fields as a live node returns
+    that node, so identical subformulas are one shared object and equality
+    is the default O(1) identity comparison. Each node also records in
+    kinds the node classes occurring in it, which lets a pass return a
+    subtree untouched when it contains nothing that pass rewrites, and
+    caches its free variables in _free once free_vars has computed them.
+    """
+    __slots__ = ("__weakref__", "kinds", "_free")
+    _fields = ()
+    _kind = 0
+    _table = weakref.WeakValueDictionary()
+
+    def __new__(cls, *fields):
+        key = (cls,) + fields
+        node = Node._table.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            kinds = cls._kind
+            for name, value in zip(cls._fields, fields):
+                object.__setattr__(node, name, value)
+                if isinstance(value, Node):
+                    kinds |= value.kinds
+                elif isinstance(value, tuple):
+                    for arg in value:
+                        kinds |= arg.kinds
+            object.__setattr__(node, "kinds", kinds)
+            object.__setattr__(node, "_free", None)
+            Node._table[key] = node
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} nodes are immutable")
+
+    def __reduce__(self):
+        return (type(self), tuple(getattr(self, f) for f in self._fields))
+
+
+def rebuild(node, *fields):
+    """Return node if fields are already its fields, else a node built from them."""
+    for name, new in zip(node._fields, fields):
+        old = getattr(node, name)
+        if new is not old and not (isinstance(old, tuple) and len(new) == len(old)
+                                   and all(a is b for a, b in zip(new, old))):
+            return type(node)(*fields)
+    return node
+
+
+class Var(Node):
+    __slots__ = _fields = ("name",)
     def __str__(self): return self.name
 
-class Const:
-    def __init__(self, name):
-        self.name = name
+class Const(Node):
+    __slots__ = _fields = ("name",)
     def __str__(self): return self.name
 
-class Func:
-    def __init__(self, name, args):
-        self.name = name
-        self.args = args
+class Func(Node):
+    __slots__ = _fields = ("name", "args")
+    def __new__(cls, name, args):
+        return super().__new__(cls, name, tuple(args))
     def __str__(self): return f"{self.name}({','.join(map(str,self.args))})"
 
-class Pred:
-    def __init__(self, name, args):
-        self.name = name
-        self.args = args
+class Pred(Node):
+    __slots__ = _fields = ("name", "args")
+    def __new__(cls, name, args):
+        return super().__new__(cls, name, tuple(args))
     def __str__(self): return f"{self.name}({','.join(map(str,self.args))})"
 
 # Logical connectives
 
-class Not:
-    def __init__(self, op):
-        self.op = op
+class Not(Node):
+    __slots__ = _fields = ("op",)
     def __str__(self): return f"¬{self.op}"
 
-class And:
-    def __init__(self, left, right):
-        self.left, self.right = left, right
+class And(Node):
+    __slots__ = _fields = ("left", "right")
     def __str__(self): return f"({self.left} ∧ {self.right})"
 
-class Or:
-    def __init__(self, left, right):
-        self.left, self.right = left, right
+class Or(Node):
+    __slots__ = _fields = ("left", "right")
     def __str__(self): return f"({self.left} ∨ {self.right})"
 
-class Impl:
-    def __init__(self, left, right):
-        self.left, self.right = left, right
+class Impl(Node):
+    __slots__ = _fields = ("left", "right")
     def __str__(self): return f"({self.left} → {self.right})"
 
-class Iff:
-    def __init__(self, left, right):
-        self.left, self.right = left, right
+class Iff(Node):
+    __slots__ = _fields = ("left", "right")
     def __str__(self): return f"({self.left} ↔ {self.right})"
 
-class ForAll:
-    def __init__(self, var, body):
-        self.var = var
-        self.body = body
+class ForAll(Node):
+    __slots__ = _fields = ("var", "body")
     def __str__(self): return f"∀{self.var}.{self.body}"
 
-class Exists:
-    def __init__(self, var, body):
-        self.var = var
-        self.body = body
+class Exists(Node):
+    __slots__ = _fields = ("var", "body")
     def __str__(self): return f"∃{self.var}.{self.body}"
 
 
+for _bit, _cls in enumerate((Var, Const, Func, Pred, Not, And, Or,
+                             Impl, Iff, ForAll, Exists)):
+    _cls._kind = 1 << _bit
+
+
+def kinds(*classes):
+    """Bit mask to test node.kinds against for any of classes."""
+    return functools.reduce(lambda mask, cls: mask | cls._kind, classes, 0)
+
+
+# ------------------- Iterative rewrite engine -------------------
+
+class Visit:
+    """A rewrite step that needs rewritten children before it can finish.
+
+    children is a list of (node, context) pairs to rewrite first; build is
+    then called with their results and may return another Visit.
+    """
+    __slots__ = ("children", "build")
+
+    def __init__(self, children, build):
+        self.children = children
+        self.build = build
+
+
+def rewrite(formula, step, context=None):
+    """Rewrite formula bottom-up with an explicit stack instead of recursion.
+
+    step(node, context) returns either the finished result for node or a
+    Visit, so formulas of any depth are handled without RecursionError.
+    """
+    results = []
+    stack = [(formula, context)]
+    pop, push = results.pop, results.append
+
+    while stack:
+        item = stack.pop()
+        if type(item) is Visit:
+            n = len(item.children)
+            if n == 2:
+                right = pop()
+                out = item.build(pop(), right)
+            elif n == 1:
+                out = item.build(pop())
+            else:
+                args = results[len(results) - n:]
+                del results[len(results) - n:]
+                out = item.build(*args)
+        else:
+            out = step(item[0], item[1])
+
+        if type(out) is Visit:
+            stack.append(out)
+            stack.extend(reversed(out.children))
+        else:
+            push(out)
+
+    return results[0]
+
+
+def _same(result):
+    return result
+
+
+def descend(node, context=None):
+    """Visit rewriting every child of node with context, then rebuilding it."""
+    if isinstance(node, (And, Or, Impl, Iff)):
+        return Visit([(node.left, context), (node.right, context)],
+                     functools.partial(rebuild, node))
+    if isinstance(node, Not):
+        return Visit([(node.op, context)], functools.partial(rebuild, node))
+    if isinstance(node, (ForAll, Exists)):
+        return Visit([(node.body, context)],
+                     functools.partial(rebuild, node, node.var))
+    if isinstance(node, (Pred, Func)):
+        return Visit([(arg, context) for arg in node.args],
+                     lambda *args: rebuild(node, node.name, args))
+    return node
+
+
 # ------------------- CNF Conversion Steps -------------------
 
-def eliminate_iff(formula):
-    """Eliminate ↔ and →."""
+_IMPLICATIONS = kinds(Impl, Iff)
+_NEGATIONS = kinds(Not)
+_EXISTENTIALS = kinds(Exists)
+_UNIVERSALS = kinds(ForAll)
+_CONJUNCTIONS = kinds(And, Or)
+_VARIABLES = kinds(Var)
+
+
+def _eliminate_iff_step(formula, _):
+    if not formula.kinds & _IMPLICATIONS:
+        return formula
+
     if isinstance(formula, Iff):
-        A = eliminate_iff(formula.left)
-        B = eliminate_iff(formula.right)
-        return And(Impl(A, B), Impl(B, A))
+        return Visit([(formula.left, None), (formula.right, None)],
+                     lambda A, B: And(Or(Not(A), B), Or(Not(B), A)))
 
     if isinstance(formula, Impl):
-        A = eliminate_iff(formula.left)
-        B = eliminate_iff(formula.right)
-        return Or(Not(A), B)
+        return Visit([(formula.left, None), (formula.right, None)],
+                     lambda A, B: Or(Not(A), B))
 
-    if isinstance(formula, (And, Or)):
-        return type(formula)(eliminate_iff(formula.left),
-                             eliminate_iff(formula.right))
+    if isinstance(formula, (And, Or, Not, ForAll, Exists)):
+        return descend(formula)
+
+    return formula
 
-    if isinstance(formula, Not):
-        return Not(eliminate_iff(formula.op))
+
+def eliminate_iff(formula):
+    """Eliminate ↔ and →."""
+    return rewrite(formula, _eliminate_iff_step)
+
+
+def _push_negation_step(formula, negated):
+    if not negated and not formula.kinds & _NEGATIONS:
+        return formula
+
+    while isinstance(formula, Not) and (negated or isinstance(
+            formula.op, (Not, And, Or, ForAll, Exists))):
+        formula, negated = formula.op, not negated
+
+    if isinstance(formula, (And, Or)):
+        if negated:
+            dual = Or if isinstance(formula, And) else And
+            return Visit([(formula.left, True), (formula.right, True)], dual)
+        return descend(formula, False)
 
     if isinstance(formula, (ForAll, Exists)):
-        return type(formula)(formula.var, eliminate_iff(formula.body))
+        if negated:
+            dual = Exists if isinstance(formula, ForAll) else ForAll
+            return Visit([(formula.body, True)],
+                         functools.partial(dual, formula.var))
+        return descend(formula, False)
 
-    return formula
+    return Not(formula) if negated else formula
 
 
 def push_negation(formula):
     """Push negations inward (De Morgan + quantifier switching)."""
-    if isinstance(formula, Not):
+    return rewrite(formula, _push_negation_step, False)
+
+
+class SymbolTable:
+    """Source of fresh symbol names for one conversion context.
+
+    Names are <base><prefix><n>, numbered per base, so tables with distinct
+    prefixes never collide. skolem() reuses the Skolem function already
+    made for the same key (a structurally identical existential and its
+    polarity), so repeated conversions share Skolem symbols instead of
+    minting new ones. Keys are held weakly, so the table never keeps a
+    formula alive; each conversion holds the keys it used until it returns.
+    """
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self.counters = {}
+        self.skolems = weakref.WeakKeyDictionary()   # node -> {polarity: name}
+
+    def fresh(self, base):
+        n = self.counters.get(base, 0)
+        self.counters[base] = n + 1
+        return f"{base}{self.prefix}{n}"
+
+    def skolem(self, key, args):
+        node, polarity = key
+        names = self.skolems.get(node)
+        if names is None:
+            names = self.skolems[node] = {}
+        name = names.get(polarity)
+        if name is None:
+            name = names[polarity] = self.fresh("Sk")
+        return Func(name, args)
+
+
+symbols = SymbolTable()
+
+
+def _merge_vars(parts):
+    if len(parts) == 1:
+        return parts[0]
+    seen, order = set(), []
+    for part in parts:
+        for v in part:
+            if v not in seen:
+                seen.add(v)
+                order.append(v)
+    return tuple(order)
+
+
+def free_vars(formula):
+    """Free variables of formula as a tuple, in order of first occurrence.
+
+    Computed bottom-up with an explicit stack and cached on every node, so
+    later calls on a node or any of its subtrees are O(1).
+    """
+    if formula._free is not None:
+        return formula._free
+
+    stack = [formula]
+    while stack:
+        node = stack[-1]
+        if node._free is not None:
+            stack.pop()
+            continue
+        if not node.kinds & _VARIABLES:
+            free = ()
+        elif isinstance(node, Var):
+            free = (node,)
+        else:
+            children = ((node.op,) if isinstance(node, Not) else
+                        node.args if isinstance(node, (Pred, Func)) else
+                        (node.body,) if isinstance(node, (ForAll, Exists)) else
+                        (node.left, node.right))
+            pending = [c for c in children if c._free is None]
+            if pending:
+                stack.extend(pending)
+                continue
+            if isinstance(node, (ForAll, Exists)):
+                free = tuple(v for v in node.body._free if v is not node.var)
+            else:
+                free = _merge_vars([c._free for c in children if c._free])
+        object.__setattr__(node, "_free", free)
+        stack.pop()
+
+    return formula._free
+
+
+def _scope_quantifier(formula):
+    """Push the quantifier of formula, whose body is miniscoped, inward."""
+    var, body = formula.var, formula.body
+    if var not in free_vars(body):
+        return body
+
+    if isinstance(body, (And, Or)):
+        in_left = var in free_vars(body.left)
+        in_right = var in free_vars(body.right)
+        quant, op = type(formula), type(body)
+        if not in_right:
+            return Visit([(quant(var, body.left), True)],
+                         lambda A: op(A, body.right))
+        if not in_left:
+            return Visit([(quant(var, body.right), True)],
+                         lambda B: op(body.left, B))
+        if (quant is ForAll) == (op is And):    # ∀ over ∧, ∃ over ∨
+            return Visit([(quant(var, body.left), True),
+                          (quant(var, body.right), True)], op)
 
-        if isinstance(formula.op, Not):
-            return push_negation(formula.op.op)
-
-        if isinstance(formula.op, And):
-            return Or(push_negation(Not(formula.op.left)),
-                      push_negation(Not(formula.op.right)))
+    return formula
 
-        if isinstance(formula.op, Or):
-            return And(push_negation(Not(formula.op.left)),
-                       push_negation(Not(formula.op.right)))
 
-        if isinstance(formula.op, ForAll):
-            return Exists(formula.op.var,
-                          push_negation(Not(formula.op.body)))
+def _miniscope_step(formula, body_done):
+    if body_done:
+        # Built by _scope_quantifier: its body is already miniscoped.
+        return _scope_quantifier(formula)
 
-        if isinstance(formula.op, Exists):
-            return ForAll(formula.op.var,
-                          push_negation(Not(formula.op.body)))
-
-    if isinstance(formula, (And, Or)):
-        return type(formula)(push_negation(formula.left),
-                             push_negation(formula.right))
+    if not formula.kinds & (_EXISTENTIALS | _UNIVERSALS):
+        return formula
 
     if isinstance(formula, (ForAll, Exists)):
-        return type(formula)(formula.var,
-                             push_negation(formula.body))
+        return Visit([(formula.body, False)],
+                     lambda body: _scope_quantifier(rebuild(formula, formula.var, body)))
+
+    if isinstance(formula, (And, Or, Not)):
+        return descend(formula, False)
 
     return formula
 
 
-skolem_counter = itertools.count()
+def miniscope(formula):
+    """Push quantifiers of an NNF formula inward as far as they go.
 
-def skolemize(formula, vars_in_scope=None):
-    """Remove ∃ by replacing with Skolem functions."""
-    if vars_in_scope is None:
-        vars_in_scope = []
+    ∀x(A ∧ B) becomes ∀xA ∧ ∀xB, ∃x(A ∨ B) becomes ∃xA ∨ ∃xB, and a
+    quantifier moves past any operand it does not bind, so existentials end
+    up inside fewer universals and get Skolem functions of smaller arity.
+    """
+    return rewrite(formula, _miniscope_step, False)
 
-    if isinstance(formula, ForAll):
-        return ForAll(formula.var,
-                      skolemize(formula.body, vars_in_scope + [formula.var]))
 
-    if isinstance(formula, Exists):
-        sk_name = f"Sk{next(skolem_counter)}"
-        sk_term = Func(sk_name, vars_in_scope)
-        return skolemize(substitute_var(formula.body,
-                                        formula.var,
-                                        sk_term),
-                         vars_in_scope)
+def _skolemize_step(formula, context):
+    if not formula.kinds & _EXISTENTIALS:
+        return formula
 
-    if isinstance(formula, (And, Or)):
-        return type(formula)(skolemize(formula.left, vars_in_scope),
-                             skolemize(formula.right, vars_in_scope))
+    if isinstance(formula, Exists):
+        table, keyed = context
+        keyed.append(formula)      # the table holds keys weakly
+        sk_term = table.skolem((formula, True), free_vars(formula))
+        return Visit([(substitute_var(formula.body, formula.var, sk_term),
+                       context)], _same)
 
-    if isinstance(formula, Not):
-        return Not(skolemize(formula.op, vars_in_scope))
+    if isinstance(formula, (And, Or, Not, ForAll)):
+        return descend(formula, context)
 
     return formula
 
 
-def substitute_var(formula, var, term):
-    """Replace variable with term."""
-    if isinstance(formula, Var):
-        return term if formula.name == var.name else formula
-
-    if isinstance(formula, Pred):
-        return Pred(formula.name,
-                    [substitute_var(a, var, term) for a in formula.args])
+def skolemize(formula, table=None):
+    """Remove ∃ by replacing with Skolem functions.
 
-    if isinstance(formula, Func):
-        return Func(formula.name,
-                    [substitute_var(a, var, term) for a in formula.args])
-
-    if isinstance(formula, (And, Or)):
-        return type(formula)(substitute_var(formula.left, var, term),
-                             substitute_var(formula.right, var, term))
+    A Skolem function takes the free variables of its existential, not every
+    enclosing universal, and identical existentials share one function
+    through the table (the module-level symbols by default).
+    """
+    return rewrite(formula, _skolemize_step, (table or symbols, []))
 
-    if isinstance(formula, Not):
-        return Not(substitute_var(formula.op, var, term))
 
-    if isinstance(formula, (ForAll, Exists)):
-        return type(formula)(formula.var,
-                             substitute_var(formula.body, var, term))
+def substitute_var(formula, var, term):
+    """Replace variable with term."""
+    return substitute_vars(formula, {var: term})
+
+
+def _fresh_var(var, taken):
+    """var renamed to <name>_<n>, with the smallest n not in taken."""
+    n = 1
+    while Var(f"{var.name}_{n}") in taken:
+        n += 1
+    return Var(f"{var.name}_{n}")
+
+
+def _substitute_step(node, mapping):
+    free = node._free if node._free is not None else free_vars(node)
+    if not any(v in mapping for v in free):
+        return node         # shared as is: nothing to replace in this subtree
+    if isinstance(node, Var):
+        return mapping[node]
+    if isinstance(node, (ForAll, Exists)):
+        var = node.var
+        inner = {v: mapping[v] for v in free if v in mapping}
+        if any(var in free_vars(term) for term in inner.values()):
+            # The binder would capture a variable of a term: rename it.
+            taken = set(free_vars(node.body))
+            for term in inner.values():
+                taken.update(free_vars(term))
+            inner[var] = fresh = _fresh_var(var, taken)
+            return Visit([(node.body, inner)], functools.partial(type(node), fresh))
+        return Visit([(node.body, inner)],
+                     functools.partial(rebuild, node, var))
+    return descend(node, mapping)
+
+
+def substitute_vars(formula, mapping):
+    """Replace the free variables in mapping by their terms, simultaneously.
+
+    Only the paths down to free occurrences of those variables are rebuilt;
+    every other subtree is returned as is, via the cached free_vars. A
+    quantifier that would capture a variable of an inserted term has its
+    variable renamed.
+    """
+    return rewrite(formula, _substitute_step, mapping) if mapping else formula
+
+
+def rename_apart(formula):
+    """Rename each quantifier that rebinds a variable bound around it, or free
+    in formula, to a fresh variable.
+
+    Skolem terms substituted into the result can then never be captured, and
+    to_cnf and fused_clauses, which both start here, see the same binders.
+    Formulas without such shadowing are returned as they are.
+    """
+    taken = set()
+
+    def step(node, scope):
+        if not node.kinds & (_EXISTENTIALS | _UNIVERSALS):
+            return node
+        if isinstance(node, (ForAll, Exists)):
+            var, body = node.var, node.body
+            if var not in scope:
+                return Visit([(body, scope | {var})],
+                             functools.partial(rebuild, node, var))
+            if not taken:
+                taken.update(_all_vars(formula))
+            fresh = _fresh_var(var, taken)
+            taken.add(fresh)
+            return Visit([(substitute_vars(body, {var: fresh}), scope | {fresh})],
+                         functools.partial(type(node), fresh))
+        return descend(node, scope)
+
+    return rewrite(formula, step, frozenset(free_vars(formula)))
+
+
+def _all_vars(formula):
+    """Every variable occurring in formula, free or bound."""
+    found, seen, stack = set(), set(), [formula]
+    while stack:
+        node = stack.pop()
+        if node in seen or not node.kinds & _VARIABLES:
+            continue
+        seen.add(node)
+        if isinstance(node, Var):
+            found.add(node)
+        elif isinstance(node, Not):
+            stack.append(node.op)
+        elif isinstance(node, (Pred, Func)):
+            stack.extend(node.args)
+        elif isinstance(node, (ForAll, Exists)):
+            stack.append(node.var)
+            stack.append(node.body)
+        else:
+            stack.append(node.left)
+            stack.append(node.right)
+    return found
+
+
+def _drop_universal_step(formula, _):
+    if not formula.kinds & _UNIVERSALS:
+        return formula
+
+    while isinstance(formula, ForAll):
+        formula = formula.body
+
+    if isinstance(formula, (And, Or, Not)):
+        return descend(formula)
 
     return formula
 
 
 def drop_universal(formula):
     """Remove universal quantifiers."""
-    if isinstance(formula, ForAll):
-        return drop_universal(formula.body)
-
-    if isinstance(formula, (And, Or)):
-        return type(formula)(drop_universal(formula.left),
-                             drop_universal(formula.right))
+    return rewrite(formula, _drop_universal_step)
 
-    if isinstance(formula, Not):
-        return Not(drop_universal(formula.op))
 
-    return formula
+def _distribute_pair(formula, A, B):
+    """Disjunction of the CNF formulas A and B, distributed into CNF."""
+    if isinstance(A, And):
+        return Visit([(Or(A.left, B), True), (Or(A.right, B), True)], And)
 
+    if isinstance(B, And):
+        return Visit([(Or(A, B.left), True), (Or(A, B.right), True)], And)
 
-def distribute_or(formula):
-    """Apply distribution: (A ∨ (B ∧ C)) = (A ∨ B) ∧ (A ∨ C)."""
-    if isinstance(formula, Or):
+    return rebuild(formula, A, B)
 
-        A = distribute_or(formula.left)
-        B = distribute_or(formula.right)
 
-        if isinstance(A, And):
-            return And(distribute_or(Or(A.left, B)),
-                       distribute_or(Or(A.right, B)))
+def _distribute_step(formula, operands_in_cnf):
+    if operands_in_cnf:
+        # Built by _distribute_pair: both sides are already in CNF.
+        return _distribute_pair(formula, formula.left, formula.right)
 
-        if isinstance(B, And):
-            return And(distribute_or(Or(A, B.left)),
-                       distribute_or(Or(A, B.right)))
+    if formula.kinds & _CONJUNCTIONS != _CONJUNCTIONS:
+        return formula      # no ∧ and ∨ to distribute over each other
 
-        return Or(A, B)
+    if isinstance(formula, Or):
+        return Visit([(formula.left, False), (formula.right, False)],
+                     functools.partial(_distribute_pair, formula))
 
     if isinstance(formula, And):
-        return And(distribute_or(formula.left),
-                   distribute_or(formula.right))
+        return descend(formula, False)
 
     return formula
 
 
-def to_cnf(formula):
+def distribute_or(formula):
+    """Apply distribution: (A ∨ (B ∧ C)) = (A ∨ B) ∧ (A ∨ C)."""
+    return rewrite(formula, _distribute_step, False)
+
+
+def formula_vars(formula):
+    """Variables of a quantifier-free formula, in order of first occurrence."""
+    seen, order, stack = set(), [], [formula]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Var):
+            if node not in seen:
+                seen.add(node)
+                order.append(node)
+        elif isinstance(node, (Pred, Func)):
+            stack.extend(reversed(node.args))
+        elif isinstance(node, Not):
+            stack.append(node.op)
+        elif isinstance(node, (And, Or)):
+            stack.append(node.right)
+            stack.append(node.left)
+    return order
+
+
+def definitional_cnf(formula, table=None):
+    """Plaisted-Greenbaum (Tseitin-style) CNF of a quantifier-free NNF formula.
+
+    Each conjunction found under a disjunction is replaced by a fresh
+    predicate Def<n>(its variables) with the clauses ¬Def ∨ Ci for its
+    conjuncts Ci. Subformulas of an NNF formula occur positively, so this
+    one direction of the definition suffices: the result is equisatisfiable
+    with the input and linear in its size. Def names come from table (the
+    module-level symbols by default).
+    """
+    table = table or symbols
+    clauses = []
+    definitions = {}
+    todo = [formula]
+
+    while todo:
+        f = todo.pop()
+        if isinstance(f, And):
+            todo.append(f.right)
+            todo.append(f.left)
+            continue
+
+        clause, parts = [], [f]
+        while parts:
+            g = parts.pop()
+            if isinstance(g, Or):
+                parts.append(g.right)
+                parts.append(g.left)
+            elif isinstance(g, And):
+                d = definitions.get(g)
+                if d is None:
+                    d = Pred(table.fresh("Def"), formula_vars(g))
+                    definitions[g] = d
+                    conjuncts = [g]
+                    while conjuncts:
+                        c = conjuncts.pop()
+                        if isinstance(c, And):
+                            conjuncts.append(c.left)
+                            conjuncts.append(c.right)
+                        else:
+                            todo.append(Or(Not(d), c))
+                clause.append(d)
+            else:
+                clause.append(g)
+        clauses.append(functools.reduce(Or, clause))
+
+    return functools.reduce(And, clauses)
+
+
+def to_cnf(formula, mode="distribute", output="formula", miniscoping=True,
+           table=None):
+    """Convert to CNF.
+
+    mode="distribute" distributes ∨ over ∧ (equivalent, but can grow
+    exponentially); mode="tseitin" uses definitional_cnf (equisatisfiable,
+    linear size). output="formula" returns an And/Or tree, output="clauses"
+    the clause_set of that tree. miniscoping runs miniscope before
+    skolemization; table supplies the Skolem and Def names.
+    """
+    if output not in ("formula", "clauses"):
+        raise ValueError(f"unknown CNF output: {output}")
+
+    formula = rename_apart(formula)
     formula = eliminate_iff(formula)
     formula = push_negation(formula)
-    formula = skolemize(formula)
+    if miniscoping:
+        formula = miniscope(formula)
+    formula = skolemize(formula, table)
     formula = drop_universal(formula)
-    formula = distribute_or(formula)
-    return formula
+    if mode == "distribute":
+        formula = distribute_or(formula)
+    elif mode == "tseitin":
+        formula = definitional_cnf(formula, table)
+    else:
+        raise ValueError(f"unknown CNF mode: {mode}")
+
+    return clause_set(formula) if output == "clauses" else formula
+
+
+def cnf_clauses(cnf):
+    """Flatten a CNF formula into a list of clauses (lists of literals)."""
+    clauses, stack = [], [cnf]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, And):
+            stack.append(node.right)
+            stack.append(node.left)
+            continue
+        clause, parts = [], [node]
+        while parts:
+            lit = parts.pop()
+            if isinstance(lit, Or):
+                parts.append(lit.right)
+                parts.append(lit.left)
+            else:
+                clause.append(lit)
+        clauses.append(clause)
+    return clauses
+
+
+def clause_set(cnf):
+    """Deduplicated clauses of a CNF formula, each a sorted tuple of literals.
+
+    Tautologies (L ∨ ¬L ∨ ...) are dropped, and so is every clause that
+    contains all the literals of another clause. Built with explicit stacks
+    and a literal -> clause index, without recursion over the formula.
+    """
+    keys = {}
+
+    def key(lit):
+        k = keys.get(lit)
+        if k is None:
+            atom = lit.op if isinstance(lit, Not) else lit
+            k = keys[lit] = (getattr(atom, "name", ""), atom is not lit, str(atom))
+        return k
+
+    clauses, seen = [], set()
+    for clause in cnf_clauses(cnf):
+        literals = set(clause)
+        if any(isinstance(lit, Not) and lit.op in literals for lit in literals):
+            continue
+        clause = tuple(sorted(literals, key=key))
+        if clause not in seen:
+            seen.add(clause)
+            clauses.append(clause)
+
+    if () in seen:
+        return [()]
+
+    # Shorter clauses first, so every clause is checked against all the
+    # clauses that could subsume it.
+    index = {}
+    kept = []
+    for i in sorted(range(len(clauses)), key=lambda i: len(clauses[i])):
+        clause = clauses[i]
+        hits = {}
+        subsumed = False
+        for lit in clause:
+            for j in index.get(lit, ()):
+                hits[j] = hits.get(j, 0) + 1
+                if hits[j] == len(clauses[j]):
+                    subsumed = True
+                    break
+            if subsumed:
+                break
+        if not subsumed:
+            kept.append(i)
+            for lit in clause:
+                index.setdefault(lit, []).append(i)
+
+    return [clauses[i] for i in sorted(kept)]
+
+
+def _convert_chunk(task):
+    """Pool worker: clauses of one chunk of formulas, with the chunk's own names."""
+    k, formulas, mode = task
+    table = SymbolTable(f"{k}_")
+    clauses = []
+    for formula in formulas:
+        clauses.extend(to_cnf(formula, mode, "clauses", table=table))
+    return clauses
+
+
+def to_cnf_batch(formulas, mode="distribute", processes=None, chunksize=64):
+    """Clause set of many independent formulas, converted on a process pool.
+
+    formulas are cut into chunks of chunksize, and chunk k takes its Skolem
+    and Def names from SymbolTable(f"{k}_"): names never collide between
+    chunks and do not depend on which worker ran a chunk. The clauses of all
+    chunks are merged in input order with duplicates dropped.
+    """
+    formulas = list(formulas)
+    tasks = [(k, formulas[i:i + chunksize], mode)
+             for k, i in enumerate(range(0, len(formulas), chunksize))]
+
+    if processes == 1 or len(tasks) <= 1:
+        results = map(_convert_chunk, tasks)
+        pool = None
+    else:
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        pool = context.Pool(processes or multiprocessing.cpu_count())
+        results = pool.imap(_convert_chunk, tasks)
+
+    merged, seen = [], set()
+    try:
+        for clauses in results:
+            for clause in clauses:
+                if clause not in seen:
+                    seen.add(clause)
+                    merged.append(clause)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    return [()] if () in seen else merged
+
+
+def _conj(A, B):
+    A.extend(B)     # operands are fresh lists, so extending in place is safe
+    return A
+
+
+def _disj(A, B):
+    return [a + b for a in A for b in B]
+
+
+def _fused_step(formula, context):
+    positive, env, table, keyed = context
+
+    while True:
+        if isinstance(formula, Not):
+            formula, positive = formula.op, not positive
+        elif isinstance(formula, (ForAll, Exists)):
+            # Keep only the bindings the body can still use.
+            inner = {v: env[v] for v in free_vars(formula) if v in env}
+            if isinstance(formula, ForAll) != positive:
+                # Key on the existential as skolemize would see it.
+                quantified = substitute_vars(formula, env)
+                keyed.append(quantified)   # the table holds keys weakly
+                inner[formula.var] = table.skolem((quantified, positive),
+                                                  free_vars(quantified))
+            formula, env = formula.body, inner
+        else:
+            break
+
+    def at(sub, polarity):
+        return (sub, (polarity, env, table, keyed))
+
+    if isinstance(formula, Impl):          # A → B  ==  ¬A ∨ B
+        return Visit([at(formula.left, not positive), at(formula.right, positive)],
+                     _disj if positive else _conj)
+
+    if isinstance(formula, Iff):           # (¬A ∨ B) ∧ (¬B ∨ A)
+        A, B = formula.left, formula.right
+        if positive:
+            return Visit([at(A, False), at(B, True), at(B, False), at(A, True)],
+                         lambda a, b, c, d: _conj(_disj(a, b), _disj(c, d)))
+        return Visit([at(A, True), at(B, False), at(B, True), at(A, False)],
+                     lambda a, b, c, d: _disj(_conj(a, b), _conj(c, d)))
+
+    if isinstance(formula, (And, Or)):
+        return Visit([at(formula.left, positive), at(formula.right, positive)],
+                     _conj if isinstance(formula, And) == positive else _disj)
+
+    if isinstance(formula, Pred):
+        formula = substitute_vars(formula, env)
+    return [[formula if positive else Not(formula)]]
+
+
+def fused_clauses(formula, table=None):
+    """Convert to a clause list in a single traversal of formula.
+
+    ↔/→ elimination, negation pushing (tracked as a polarity flag) and
+    skolemization are done while walking the input once; ∀ is dropped on the
+    way and ∧/∨ are combined directly as clause lists. Produces the same
+    clauses as cnf_clauses(to_cnf(formula, miniscoping=False)); like to_cnf
+    it first renames shadowing quantifiers apart, so the Skolem terms in env
+    are never captured.
+    """
+    return rewrite(rename_apart(formula), _fused_step,
+                   (True, {}, table or symbols, []))
+
+
+# ------------------- Parsing -------------------
+
+_TOKEN = re.compile(r"\s*([A-Za-z0-9_]+|<->|<=>|->|=>|#.*|\S)")
+
+_CANONICAL = {"~": "¬", "!": "¬", "&": "∧", "|": "∨", "->": "→", "=>": "→",
+              "<->": "↔", "<=>": "↔", "forall": "∀", "exists": "∃"}
+
+# Binary connectives: precedence, right-associative.
+_BINARY = {"∧": (4, False), "∨": (3, False), "→": (2, True), "↔": (1, False)}
+_CONNECTIVES = {"∧": And, "∨": Or, "→": Impl, "↔": Iff}
+
+
+def tokenize(text):
+    """Split text into tokens, mapping ASCII connectives and forall/exists to
+    the symbols the __str__ methods print. A # comment runs to the end of
+    its line."""
+    get = _CANONICAL.get
+    return [get(token, token) for token in _TOKEN.findall(text)
+            if token[0] != "#"]
+
+
+def _is_name(token):
+    return token[:1].isalnum() or token[:1] == "_"
+
+
+def _syntax_error(text, tokens, i, expected):
+    """ValueError for tokens[i] of text, located only once parsing fails."""
+    if i < len(tokens) - 1:
+        pos = [m.start(1) for m in _TOKEN.finditer(text)
+               if m.group(1)[0] != "#"][i]
+        return ValueError(f"expected {expected} at {pos}, got {tokens[i]!r}")
+    return ValueError(f"expected {expected} at end of formula")
+
+
+def _parse_args(text, tokens, i, bound):
+    """Terms of the argument list opening at tokens[i]; returns (args, next i).
+
+    Nested function terms are parsed with an explicit stack of open lists.
+    """
+    lists, names = [[]], []
+    i += 1
+    while True:
+        token = tokens[i]
+        if token == ")" and not lists[-1]:          # f()
+            pass
+        elif not _is_name(token):
+            raise _syntax_error(text, tokens, i, "a term")
+        elif tokens[i + 1] == "(":
+            names.append(token)
+            lists.append([])
+            i += 2
+            continue
+        else:
+            if token in bound or token[0].islower() or token[0] == "_":
+                lists[-1].append(Var(token))
+            else:
+                lists[-1].append(Const(token))
+            i += 1
+
+        while tokens[i] == ")":
+            args = lists.pop()
+            i += 1
+            if not names:
+                return args, i
+            lists[-1].append(Func(names.pop(), args))
+        if tokens[i] != ",":
+            raise _syntax_error(text, tokens, i, "',' or ')'")
+        i += 1
+
+
+def parse_formula(text):
+    """Parse a formula written like the __str__ output of the node classes.
+
+    ¬ ∧ ∨ → ↔ ∀ ∃ may also be written ~ (or !) & | -> (or =>) <-> (or <=>)
+    forall exists. ¬ and quantifiers ("∀x.", "forall x, y.") apply to the
+    smallest formula after them; then ∧ binds tightest, then ∨, → (right
+    associative) and ↔. A name is a variable if a quantifier binds it or it
+    starts with a lowercase letter, otherwise a constant; name(...) is a
+    predicate at formula level and a function inside arguments. Parsed by
+    operator precedence with explicit stacks, so nesting depth is unbounded.
+    """
+    tokens = tokenize(text)
+    tokens.append("")                   # end marker
+    operands, operators = [], []        # operators: "(", "¬", binary, or (q, vars)
+    bound = {}
+    i = 0
+
+    def reduce():
+        op = operators.pop()
+        if op == "¬":
+            operands.append(Not(operands.pop()))
+        elif type(op) is tuple:
+            quantifier, names = op
+            body = operands.pop()
+            for name in reversed(names):
+                body = quantifier(Var(name), body)
+                bound[name] -= 1
+                if not bound[name]:
+                    del bound[name]
+            operands.append(body)
+        else:
+            right = operands.pop()
+            operands.append(_CONNECTIVES[op](operands.pop(), right))
+
+    while True:
+        # Expecting a formula: prefix operators, then an atom or "(".
+        token = tokens[i]
+        if token == "¬" or token == "(":
+            operators.append(token)
+            i += 1
+            continue
+        if token == "∀" or token == "∃":
+            names = []
+            i += 1
+            while tokens[i] != ".":
+                name = tokens[i]
+                if name != ",":
+                    if not _is_name(name) or name[0].isdigit():
+                        raise _syntax_error(text, tokens, i, "a variable or '.'")
+                    names.append(name)
+                    bound[name] = bound.get(name, 0) + 1
+                i += 1
+            if not names:
+                raise _syntax_error(text, tokens, i, "a variable")
+            operators.append((ForAll if token == "∀" else Exists, tuple(names)))
+            i += 1
+            continue
+        if not _is_name(token) or token[0].isdigit():
+            raise _syntax_error(text, tokens, i, "a formula")
+        if tokens[i + 1] == "(":
+            args, i = _parse_args(text, tokens, i + 1, bound)
+            operands.append(Pred(token, args))
+        else:
+            operands.append(Pred(token, ()))
+            i += 1
+
+        # After a formula: closing parentheses, then a binary connective or the end.
+        token = tokens[i]
+        while token == ")":
+            while operators and operators[-1] != "(":
+                reduce()
+            if not operators:
+                raise _syntax_error(text, tokens, i, "a connective")
+            operators.pop()
+            i += 1
+            token = tokens[i]
+
+        binary = _BINARY.get(token)
+        if binary is not None:
+            prec, right_assoc = binary
+            while operators and operators[-1] != "(":
+                top = _BINARY.get(operators[-1]) if type(operators[-1]) is str else None
+                if top is not None and (top[0] < prec or top[0] == prec and right_assoc):
+                    break
+                reduce()
+            operators.append(token)
+            i += 1
+            continue
+
+        if token:
+            raise _syntax_error(text, tokens, i, "a connective")
+        while operators:
+            if operators[-1] == "(":
+                raise ValueError("unbalanced '(' at end of formula")
+            reduce()
+        return operands[0]
+
+
+def iter_formulas(lines):
+    """Parse formulas from an iterable of lines, such as an open axiom file.
+
+    One formula per line; a line with unclosed parentheses continues on the
+    next, blank lines are skipped and # starts a comment. Lines are read and
+    formulas yielded one at a time, so files of any size stream.
+    """
+    pending, depth = [], 0
+    for line in lines:
+        text = line.split("#", 1)[0]
+        if not pending and not text.strip():
+            continue
+        pending.append(text)
+        depth += text.count("(") - text.count(")")
+        if depth <= 0:
+            yield parse_formula(" ".join(pending))
+            pending, depth = [], 0
+    if pending:
+        yield parse_formula(" ".join(pending))
 
 
 # ---------------- Example usage -------------------
 
-# ∀x (P(x) → ∃y Q(x,y))
+if __name__ == "__main__":
+    # ∀x (P(x) → ∃y Q(x,y))
+
+    formula = ForAll(Var("x"),
+                     Impl(Pred("P", [Var("x")]),
+                          Exists(Var("y"),
+                                 Pred("Q", [Var("x"), Var("y")]))))
+
+    cnf = to_cnf(formula)
+    print("CNF:", cnf)
+
+    # (P(x) ∧ Q(x)) ∨ (R(x) ∧ S(x)), definitional encoding
+
+    P, Q, R, S = (Pred(name, [Var("x")]) for name in "PQRS")
+    print("Tseitin CNF:", to_cnf(Or(And(P, Q), And(R, S)), mode="tseitin"))
+
+    print("Clause set:",
+          [[str(lit) for lit in clause]
+           for clause in to_cnf(And(Or(P, Q), And(P, Or(Q, Not(Q)))),
+                                output="clauses")])
 
-formula = ForAll(Var("x"),
-                 Impl(Pred("P", [Var("x")]),
-                      Exists(Var("y"),
-                             Pred("Q", [Var("x"), Var("y")]))))
+    print("Fused clauses:",
+          [[str(lit) for lit in clause] for clause in fused_clauses(formula)])
 
-cnf = to_cnf(formula)
-print("CNF:", cnf)
+    parsed = parse_formula("forall x. (P(x) -> exists y. Q(x, y))")
+    print("Parsed:", parsed, parsed is formula)
@@ -0,0 +1,83 @@
+# ---------------------------------------------
+# Benchmark: staged to_cnf vs single-pass fused_clauses
+# ---------------------------------------------
+
+import timeit
+
+from fol_to_cnf import (And, Exists, ForAll, Iff, Impl, Pred, SymbolTable, Var,
+                        cnf_clauses, fused_clauses, to_cnf, to_cnf_batch)
+
+
+def deep_formula(depth):
+    """∀x0 (P0(x0) → ∃y0 (Q0(x0,y0) ∧ ∀x1 (P1(x1) → ...)))"""
+    formula = Pred("R", [Var(f"x{depth - 1}")])
+    for i in reversed(range(depth)):
+        x, y = Var(f"x{i}"), Var(f"y{i}")
+        formula = ForAll(x, Impl(Pred(f"P{i}", [x]),
+                                 Exists(y, And(Pred(f"Q{i}", [x, y]), formula))))
+    return formula
+
+
+def wide_formula(width):
+    """A conjunction of width axioms ∀x (Pi(x) ↔ ∃y Ri(x,y))."""
+    axioms = []
+    for i in range(width):
+        x, y = Var("x"), Var("y")
+        axioms.append(ForAll(x, Iff(Pred(f"P{i}", [x]),
+                                    Exists(y, Pred(f"R{i}", [x, y])))))
+    formula = axioms[0]
+    for axiom in axioms[1:]:
+        formula = And(formula, axiom)
+    return formula
+
+
+def chain_formula(length):
+    """∀x ((((P0(x) → Q(x)) ∧ (P1(x) → Q(x))) ∧ ...): a left-deep chain far
+    deeper than Python's recursion limit."""
+    x = Var("x")
+    formula = Impl(Pred("P0", [x]), Pred("Q", [x]))
+    for i in range(1, length):
+        formula = And(formula, Impl(Pred(f"P{i}", [x]), Pred("Q", [x])))
+    return ForAll(x, formula)
+
+
+def staged(formula, table=None):
+    return cnf_clauses(to_cnf(formula, miniscoping=False, table=table))
+
+
+def compare(name, formula, repeat=5):
+    # Same Skolem numbering for both, so the clause lists can be compared.
+    expected = staged(formula, SymbolTable())
+    assert fused_clauses(formula, SymbolTable()) == expected, name
+
+    t_staged = min(timeit.repeat(lambda: staged(formula), number=1, repeat=repeat))
+    t_fused = min(timeit.repeat(lambda: fused_clauses(formula), number=1, repeat=repeat))
+    print(f"{name:<12} {len(expected):>6} clauses   staged {t_staged * 1000:8.2f} ms"
+          f"   fused {t_fused * 1000:8.2f} ms   x{t_staged / t_fused:.2f}")
+
+
+def compare_batch(count, depth=8):
+    formulas = [deep_formula(depth) if i % 2 else wide_formula(depth)
+                for i in range(count)]
+    # Distinct formulas, as in an axiom file: rename the predicates.
+    formulas = [And(formula, Pred(f"Axiom{i}", [])) for i, formula in enumerate(formulas)]
+
+    start = timeit.default_timer()
+    clauses = to_cnf_batch(formulas, processes=1)
+    t_serial = timeit.default_timer() - start
+    start = timeit.default_timer()
+    assert to_cnf_batch(formulas) == clauses
+    t_pool = timeit.default_timer() - start
+    print(f"batch {count:<6} {len(clauses):>6} clauses   serial {t_serial * 1000:8.2f} ms"
+          f"   pool {t_pool * 1000:8.2f} ms   x{t_serial / t_pool:.2f}")
+
+
+if __name__ == "__main__":
+    for depth in (20, 40, 60):
+        compare(f"deep {depth}", deep_formula(depth))
+    for width in (50, 100, 200):
+        compare(f"wide {width}", wide_formula(width))
+    for length in (5000, 20000):
+        compare(f"chain {length}", chain_formula(length), repeat=2)
+    for count in (1000, 4000):
+        compare_batch(count)
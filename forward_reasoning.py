@@ -10,12 +10,69 @@
 #   Grandparent(John,Susan)
 # -------------------------------
 
-from copy import deepcopy
+import itertools
+import json
+import multiprocessing
+import sys
+from collections import defaultdict
+
+
+class Substitution:
+    """Immutable substitution stored as a linked chain of bindings.
+
+    extend() returns a new substitution that shares the existing chain, so
+    binding a variable is O(1) and partial matches never have to be copied
+    before they are extended. It offers the read-only dict methods used by
+    unify and substitute.
+    """
+
+    __slots__ = ("var", "value", "parent")
+
+    def __init__(self, var=None, value=None, parent=None):
+        self.var = var
+        self.value = value
+        self.parent = parent
+
+    def extend(self, var, value):
+        return Substitution(var, value, self)
+
+    def get(self, var, default=None):
+        node = self
+        while node.parent is not None:
+            if node.var == var:
+                return node.value
+            node = node.parent
+        return default
+
+    def __getitem__(self, var):
+        value = self.get(var, self)
+        if value is self:
+            raise KeyError(var)
+        return value
+
+    def __contains__(self, var):
+        return self.get(var, self) is not self
+
+    def items(self):
+        node = self
+        while node.parent is not None:
+            yield node.var, node.value
+            node = node.parent
+
+    def as_dict(self):
+        return dict(self.items())
+
+    def __len__(self):
+        return sum(1 for _ in self.items())
+
+    def __repr__(self):
+        return f"Substitution({self.as_dict()})"
+
 
 def unify(a, b, subst=None):
-    """Unify two literals a and b with a substitution."""
+    """Unify two literals a and b with a substitution (Substitution or dict)."""
     if subst is None:
-        subst = {}
+        subst = Substitution()
 
     if a == b:
         return subst
@@ -44,18 +101,152 @@ def unify_var(var, x, subst):
         return unify(subst[var], x, subst)
     elif x in subst:
         return unify(var, subst[x], subst)
+    elif isinstance(subst, Substitution):
+        return subst.extend(var, x)
     else:
         subst[var] = x
         return subst
 
 
 def substitute(term, subst):
-    """Apply substitution to a literal."""
+    """Apply substitution to a literal, following chains of bound variables."""
     if isinstance(term, str):
-        return subst.get(term, term)
+        value = subst.get(term, term)
+        return value if value == term else substitute(value, subst)
     return (term[0],) + tuple(substitute(arg, subst) for arg in term[1:])
 
 
+def is_variable(term):
+    """Variables are strings starting with a lowercase letter."""
+    return isinstance(term, str) and term[0].islower()
+
+
+class FactStore:
+    """Set of ground facts indexed by predicate and by argument constants.
+
+    A premise such as ("Parent", "Mary", "y") is only matched against facts
+    with predicate Parent/2 whose first argument is Mary, instead of against
+    every known fact.
+    """
+
+    def __init__(self, facts=()):
+        self.facts = set()
+        self.by_pred = defaultdict(set)    # (name, arity) -> facts
+        self.by_arg = defaultdict(set)     # (name, arity, pos, const) -> facts
+        self.distinct = defaultdict(int)   # (name, arity, pos) -> distinct constants
+        self.update(facts)
+
+    def __contains__(self, fact):
+        return fact in self.facts
+
+    def __iter__(self):
+        return iter(self.facts)
+
+    def __len__(self):
+        return len(self.facts)
+
+    def add(self, fact):
+        """Add a fact; return True if it was not already stored."""
+        if fact in self.facts:
+            return False
+        self.facts.add(fact)
+        key = (fact[0], len(fact) - 1)
+        self.by_pred[key].add(fact)
+        for pos, arg in enumerate(fact[1:]):
+            bucket = self.by_arg[key + (pos, arg)]
+            if not bucket:
+                self.distinct[key + (pos,)] += 1
+            bucket.add(fact)
+        return True
+
+    def discard(self, fact):
+        """Remove a fact; return True if it was stored."""
+        if fact not in self.facts:
+            return False
+        self.facts.discard(fact)
+        key = (fact[0], len(fact) - 1)
+        self.by_pred[key].discard(fact)
+        if not self.by_pred[key]:
+            del self.by_pred[key]
+        for pos, arg in enumerate(fact[1:]):
+            bucket = self.by_arg[key + (pos, arg)]
+            bucket.discard(fact)
+            if not bucket:
+                del self.by_arg[key + (pos, arg)]
+                self.distinct[key + (pos,)] -= 1
+        return True
+
+    def update(self, facts):
+        for fact in facts:
+            self.add(fact)
+
+    def candidates(self, pattern):
+        """Return the smallest indexed bucket of facts that may match pattern."""
+        key = (pattern[0], len(pattern) - 1)
+        best = self.by_pred.get(key, ())
+        for pos, arg in enumerate(pattern[1:]):
+            if isinstance(arg, str) and not is_variable(arg):
+                bucket = self.by_arg.get(key + (pos, arg), ())
+                if len(bucket) < len(best):
+                    best = bucket
+        return best
+
+    def estimate(self, pattern, bound=()):
+        """Estimated number of facts matching pattern once the variables in
+        bound are known: exact bucket sizes for constants, and a uniform
+        1/distinct-values selectivity for each bound variable."""
+        key = (pattern[0], len(pattern) - 1)
+        count = len(self.by_pred.get(key, ()))
+        if not count:
+            return 0
+        estimate = float(count)
+        for pos, arg in enumerate(pattern[1:]):
+            if not is_variable(arg):
+                estimate *= len(self.by_arg.get(key + (pos, arg), ())) / count
+            elif arg in bound:
+                estimate /= max(1, self.distinct[key + (pos,)])
+        return estimate
+
+
+def literal_vars(literal):
+    return {arg for arg in literal[1:] if is_variable(arg)}
+
+
+def plan_premises(premises, sources):
+    """Cost-based join order: indices of premises, cheapest remaining first.
+
+    sources[j] is the tuple of FactStores premise j is matched against. The
+    planner repeatedly picks the premise with the fewest estimated matches
+    given the variables bound so far, preferring premises connected to those
+    variables over cross products.
+    """
+    remaining = list(range(len(premises)))
+    order = []
+    bound = set()
+
+    while remaining:
+        def cost(j):
+            variables = literal_vars(premises[j])
+            connected = not bound or not variables or bool(variables & bound)
+            estimate = sum(store.estimate(premises[j], bound)
+                           for store in sources[j])
+            return (not connected, estimate, j)
+
+        best = min(remaining, key=cost)
+        remaining.remove(best)
+        order.append(best)
+        bound |= literal_vars(premises[best])
+
+    return order
+
+
+def plan_rules(rules, store):
+    """Reorder the premises of every rule using the statistics of store."""
+    return [(head, [premises[j] for j in
+                    plan_premises(premises, [(store,)] * len(premises))])
+            for head, premises in rules]
+
+
 # Horn Rule = (head, [premises...])
 rules = [
     (("Parent", "x", "y"), [("Father", "x", "y")]),
@@ -73,7 +264,8 @@ query = ("Grandparent", "John", "Susan")
 
 def forward_chain(rules, facts, query):
     """Perform forward chaining and return True if query is derived."""
-    known = set(facts)
+    known = FactStore(facts)
+    rules = plan_rules(rules, known)
 
     added_new_fact = True
 
@@ -82,17 +274,7 @@ def forward_chain(rules, facts, query):
 
         for head, premises in rules:
             # Try to match all premises
-            substitutions = [{}]
-
-            for prem in premises:
-                new_subs = []
-                for subst in substitutions:
-                    prem_inst = substitute(prem, subst)
-                    for fact in known:
-                        s = unify(prem_inst, fact, deepcopy(subst))
-                        if s is not None:
-                            new_subs.append(s)
-                substitutions = new_subs
+            substitutions = match_premises(premises, [(known,)] * len(premises))
 
             # Add new facts derived from head
             for subst in substitutions:
@@ -110,5 +292,721 @@ def forward_chain(rules, facts, query):
     return False
 
 
-# Run forward chaining
-forward_chain(rules, facts, query)
+def match_premises(premises, sources, subst=None):
+    """Join premises left to right, matching premise i only against sources[i].
+
+    Each entry of sources is a tuple of FactStores searched together; only
+    the indexed candidates for the instantiated premise are unified. The
+    join starts from subst when given.
+    """
+    substitutions = [subst if subst is not None else Substitution()]
+
+    for prem, source in zip(premises, sources):
+        new_subs = []
+        for subst in substitutions:
+            prem_inst = substitute(prem, subst)
+            for store in source:
+                for fact in store.candidates(prem_inst):
+                    s = unify(prem_inst, fact, subst)
+                    if s is not None:
+                        new_subs.append(s)
+        substitutions = new_subs
+        if not substitutions:
+            break
+
+    return substitutions
+
+
+def delta_join(premises, i, old, delta):
+    """Substitutions for a rule using the delta facts at premise i.
+
+    Premises before i match old facts and those after i old + delta; the
+    join runs in the planned cheapest order.
+    """
+    sources = ([(old,)] * i + [(delta,)] +
+               [(old, delta)] * (len(premises) - i - 1))
+    order = plan_premises(premises, sources)
+    return match_premises([premises[j] for j in order],
+                          [sources[j] for j in order])
+
+
+def derive(rules, facts, provenance=False):
+    """Yield the facts derived by semi-naive evaluation as they are produced.
+
+    For a rule with premises p1..pn, each round's delta is joined at every
+    position i in turn, with p1..p(i-1) matched against the old facts and
+    p(i+1)..pn against old + delta, so no derivation is repeated across
+    rounds. With provenance=True, yields (fact, rule index, premise facts).
+    Rules without premises fire once, in round 0.
+    """
+    old = FactStore()
+    delta = FactStore(facts)
+
+    for r, (head, premises) in enumerate(rules):
+        if not premises and delta.add(head):
+            yield (head, r, ()) if provenance else head
+
+    while delta:
+        new = FactStore()
+
+        for r, (head, premises) in enumerate(rules):
+            for i in range(len(premises)):
+                for subst in delta_join(premises, i, old, delta):
+                    new_fact = substitute(head, subst)
+                    if new_fact in old or new_fact in delta or not new.add(new_fact):
+                        continue
+                    if provenance:
+                        yield (new_fact, r,
+                               tuple(substitute(prem, subst) for prem in premises))
+                    else:
+                        yield new_fact
+
+        old.update(delta)
+        delta = new
+
+
+def semi_naive_forward_chain(rules, facts, query):
+    """Semi-naive forward chaining: every join uses at least one new fact."""
+    if query in facts:
+        print("\nQuery proven by forward chaining!")
+        return True
+
+    for new_fact in derive(rules, facts):
+        print(f"Derived new fact: {new_fact}")
+
+        if new_fact == query:
+            print("\nQuery proven by forward chaining!")
+            return True
+
+    print("\nQuery NOT provable from given KB.")
+    return False
+
+
+def _as_tuple(value):
+    if isinstance(value, list):
+        return tuple(_as_tuple(v) for v in value)
+    return value
+
+
+def dump_facts(items, fp):
+    """Write facts (or provenance tuples) to fp as line-delimited JSON arrays.
+
+    items may be a generator such as derive(...), so facts are written while
+    they are being derived. Returns the number of lines written.
+    """
+    count = 0
+
+    def lines():
+        nonlocal count
+        for item in items:
+            count += 1
+            yield json.dumps(item, separators=(",", ":")) + "\n"
+
+    fp.writelines(lines())
+    return count
+
+
+def load_facts(fp):
+    """Read back what dump_facts wrote, one fact (or tuple) per line."""
+    for line in fp:
+        if line.strip():
+            yield _as_tuple(json.loads(line))
+
+
+def pattern_key(pattern):
+    """Rename variables by first occurrence so variant patterns get one key."""
+    names = {}
+    key = [pattern[0]]
+    for arg in pattern[1:]:
+        if is_variable(arg):
+            arg = names.setdefault(arg, f"?{len(names)}")
+        key.append(arg)
+    return tuple(key)
+
+
+class ReteNetwork:
+    """Horn rules compiled into a Rete-style discrimination/join network.
+
+    Each distinct premise pattern gets an alpha memory holding the facts
+    that pass its constant and repeated-variable tests. Each rule is a chain
+    of join nodes; beta memory k of a rule holds the partial substitutions
+    matching its first k premises. Join node k hashes both of its inputs on
+    the values of its join variables (those of premise k already bound by
+    the earlier premises), so a new fact or partial match only meets the
+    partners that agree with it. Asserting a fact only propagates the new
+    matches it creates, so derived facts come out without re-running the
+    rules over the whole fact base.
+    """
+
+    def __init__(self, rules):
+        self.facts = FactStore()
+        self.alphas = {}                     # pattern key -> (pattern, FactStore)
+        self.alphas_by_pred = defaultdict(list)
+        self.successors = defaultdict(list)  # pattern key -> [(rule, position)]
+        self.rules = []
+        self.join_vars = []                  # rule -> [join variables per position]
+        self.betas = []                      # rule -> [join key -> tokens]
+        self.alpha_index = []                # rule -> [join key -> facts]
+
+        for r, (head, premises) in enumerate(rules):
+            keys = [self._alpha_memory(prem) for prem in premises]
+            for k, key in enumerate(keys):
+                self.successors[key].append((r, k))
+            self.rules.append((head, premises, keys))
+
+            join_vars, bound = [], set()
+            for prem in premises:
+                join_vars.append(tuple(dict.fromkeys(
+                    arg for arg in prem[1:] if arg in bound)))
+                bound |= literal_vars(prem)
+            self.join_vars.append(join_vars)
+            self.betas.append([defaultdict(list) for _ in premises])
+            self.alpha_index.append([defaultdict(list) for _ in premises])
+            if premises:
+                self.betas[r][0][()].append(Substitution())
+
+        # A rule without premises holds unconditionally: assert its head now.
+        self.initial_facts = []
+        for head, premises in rules:
+            if not premises and head not in self.facts:
+                self.initial_facts.append(head)
+                self.initial_facts.extend(self.assert_fact(head))
+
+    def _alpha_memory(self, pattern):
+        key = pattern_key(pattern)
+        if key not in self.alphas:
+            self.alphas[key] = (pattern, FactStore())
+            self.alphas_by_pred[(pattern[0], len(pattern) - 1)].append(key)
+        return key
+
+    def assert_fact(self, fact):
+        """Add a fact and return the list of facts it newly derives."""
+        derived = []
+        agenda = [fact]
+
+        while agenda:
+            current = agenda.pop()
+            if not self.facts.add(current):
+                continue
+            if current is not fact:
+                derived.append(current)
+
+            # Fill every alpha memory first, then right-activate the joins
+            # deepest-first so a fact joining with itself is matched once.
+            activations = []
+            for key in self.alphas_by_pred.get((current[0], len(current) - 1), ()):
+                pattern, memory = self.alphas[key]
+                if unify(pattern, current) is not None:
+                    memory.add(current)
+                    for r, k in self.successors[key]:
+                        match = unify(self.rules[r][1][k], current)
+                        join_key = tuple(match[v] for v in self.join_vars[r][k])
+                        self.alpha_index[r][k][join_key].append(current)
+                        activations.append((r, k, join_key))
+            activations.sort(key=lambda rkj: -rkj[1])
+
+            for r, k, join_key in activations:
+                premise = self.rules[r][1][k]
+                for token in self.betas[r][k].get(join_key, ()):
+                    s = unify(substitute(premise, token), current, token)
+                    if s is not None:
+                        self._left_activate(r, k + 1, s, agenda)
+
+        return derived
+
+    def assert_facts(self, facts):
+        derived = []
+        for fact in facts:
+            derived.extend(self.assert_fact(fact))
+        return derived
+
+    def _left_activate(self, r, k, token, agenda):
+        """Store a partial match in beta memory k and join it with alpha k."""
+        head, premises, keys = self.rules[r]
+        if k == len(premises):
+            new_fact = substitute(head, token)
+            if new_fact not in self.facts:
+                agenda.append(new_fact)
+            return
+
+        join_key = tuple(token[v] for v in self.join_vars[r][k])
+        self.betas[r][k][join_key].append(token)
+        prem_inst = substitute(premises[k], token)
+        for fact in self.alpha_index[r][k].get(join_key, ()):
+            s = unify(prem_inst, fact, token)
+            if s is not None:
+                self._left_activate(r, k + 1, s, agenda)
+
+
+def rete_forward_chain(rules, facts, query):
+    """Stream facts one at a time through a ReteNetwork built from rules."""
+    network = ReteNetwork(rules)
+    batches = itertools.chain([network.initial_facts],
+                              map(network.assert_fact, facts))
+
+    for derived in batches:
+        for new_fact in derived:
+            print(f"Derived new fact: {new_fact}")
+        if query in network.facts:
+            print("\nQuery proven by forward chaining!")
+            return True
+
+    print("\nQuery NOT provable from given KB.")
+    return False
+
+
+class _Consumer:
+    """A rule instance suspended on the answer table of one of its premises.
+
+    It resumes from offset, the number of that table's answers it has
+    already joined, so each answer meets each consumer exactly once.
+    """
+
+    __slots__ = ("caller", "head", "premises", "position", "subst", "goal",
+                 "table", "offset", "queued")
+
+    def __init__(self, caller, head, premises, position, subst, goal, table):
+        self.caller = caller
+        self.head = head
+        self.premises = premises
+        self.position = position
+        self.subst = subst
+        self.goal = goal
+        self.table = table
+        self.offset = 0
+        self.queued = True
+
+
+class BackwardChainer:
+    """Goal-directed (SLD) prover over the rules/facts format, with tabling.
+
+    Answers to every subgoal, up to variable renaming, are kept in a table.
+    Calling a subgoal opens its table once; the rule instance that called it
+    is suspended as a consumer of the table and resumed whenever the table
+    grows, joining only the answers past its offset (SLG-style semi-naive
+    evaluation). Recursive rules therefore terminate, no answer is joined
+    twice, and completed subgoals are never solved again.
+    """
+
+    def __init__(self, rules, facts):
+        self.facts = FactStore(facts)
+        self.rules_by_head = defaultdict(list)
+        for head, premises in rules:
+            self.rules_by_head[head[0]].append(
+                (head, premises, self._rule_vars(head, premises)))
+        self.tables = {}       # pattern key -> answers in insertion order
+        self.answer_sets = {}  # pattern key -> set of answers
+        self.consumers = {}    # pattern key of an open table -> [_Consumer]
+        self.complete = set()
+        self.agenda = []       # goals to evaluate and consumers to resume
+        self.activations = 0
+        self.answers_added = 0
+        self.renamings = 0
+
+    @staticmethod
+    def _rule_vars(head, premises):
+        return {arg for lit in [head] + list(premises)
+                for arg in lit[1:] if is_variable(arg)}
+
+    def ask(self, goal):
+        """Return the set of facts matching goal that follow from the KB."""
+        key = self._call(goal)
+        self._run()
+        return set(self.tables[key])
+
+    def prove(self, goal):
+        return bool(self.ask(goal))
+
+    def _rename(self, head, premises, variables):
+        self.renamings += 1
+        fresh = {var: f"{var}_{self.renamings}" for var in variables}
+        return substitute(head, fresh), [substitute(p, fresh) for p in premises]
+
+    def _call(self, goal):
+        """Key of the table for goal, opened and scheduled on first call."""
+        key = pattern_key(goal)
+        if key not in self.tables:
+            self.tables[key] = []
+            self.answer_sets[key] = set()
+            self.consumers[key] = []
+            self.activations += 1
+            self.agenda.append(goal)
+        return key
+
+    def _run(self):
+        """Work through the agenda; every open table is then complete."""
+        while self.agenda:
+            item = self.agenda.pop()
+            if isinstance(item, _Consumer):
+                self._resume(item)
+            else:
+                self._evaluate(item)
+        self.complete.update(self.consumers)
+        self.consumers.clear()
+
+    def _evaluate(self, goal):
+        """Answer goal from the facts and start every rule whose head matches."""
+        key = pattern_key(goal)
+        for fact in self.facts.candidates(goal):
+            if unify(goal, fact) is not None:
+                self._add_answer(key, fact)
+
+        for head, premises, variables in self.rules_by_head.get(key[0], ()):
+            if len(head) != len(goal):
+                continue
+            head, premises = self._rename(head, premises, variables)
+            subst = unify(head, goal)
+            if subst is not None:
+                self._continue(key, head, premises, 0, subst)
+
+    def _continue(self, caller, head, premises, position, subst):
+        """Solve premises[position:] of a rule instance for the caller's table."""
+        if position == len(premises):
+            self._add_answer(caller, substitute(head, subst))
+            return
+
+        goal = substitute(premises[position], subst)
+        consumer = _Consumer(caller, head, premises, position, subst, goal,
+                             self._call(goal))
+        if consumer.table not in self.complete:
+            self.consumers[consumer.table].append(consumer)
+        self.agenda.append(consumer)
+
+    def _resume(self, consumer):
+        """Join the answers a consumer has not seen yet."""
+        answers = self.tables[consumer.table]
+        while consumer.offset < len(answers):
+            answer = answers[consumer.offset]
+            consumer.offset += 1
+            s = unify(consumer.goal, answer, consumer.subst)
+            if s is not None:
+                self._continue(consumer.caller, consumer.head,
+                               consumer.premises, consumer.position + 1, s)
+        consumer.queued = False
+
+    def _add_answer(self, key, answer):
+        if answer in self.answer_sets[key]:
+            return
+        self.answer_sets[key].add(answer)
+        self.tables[key].append(answer)
+        self.answers_added += 1
+        for consumer in self.consumers.get(key, ()):
+            if not consumer.queued:
+                consumer.queued = True
+                self.agenda.append(consumer)
+
+
+def backward_chain(rules, facts, query):
+    """Answer query by tabled backward chaining instead of saturating the KB."""
+    if BackwardChainer(rules, facts).prove(query):
+        print("\nQuery proven by backward chaining!")
+        return True
+
+    print("\nQuery NOT provable from given KB.")
+    return False
+
+
+def magic_sets_rewrite(rules, query):
+    """Rewrite rules with the magic-sets transformation for query.
+
+    Every derived predicate p reachable from the query is specialised per
+    adornment (which arguments are bound, e.g. "bf") into p_<adornment>, and
+    guarded by a magic_p_<adornment> predicate that holds the bindings
+    demanded for it, passed left to right through the rule bodies. Bottom-up
+    evaluation of the result then only derives facts relevant to the
+    constants in query.
+
+    Returns (magic_rules, seed, goal): the seed fact must be added to the
+    facts, and answers to query are the derived facts matching goal.
+    """
+    derived = {(head[0], len(head) - 1) for head, _ in rules}
+
+    def adornment(atom, bound):
+        return "".join("b" if not is_variable(arg) or arg in bound else "f"
+                       for arg in atom[1:])
+
+    def adorned(atom, adorn):
+        return (f"{atom[0]}_{adorn}",) + atom[1:]
+
+    def magic(atom, adorn):
+        return (f"magic_{atom[0]}_{adorn}",) + tuple(
+            arg for arg, mode in zip(atom[1:], adorn) if mode == "b")
+
+    query_adorn = adornment(query, set())
+    todo = [(query[0], len(query) - 1, query_adorn)]
+    seen = set(todo)
+    magic_rules = []
+
+    while todo:
+        name, arity, adorn = todo.pop()
+
+        # Facts given directly for a derived predicate still count.
+        pattern = (name,) + tuple(f"v{i}" for i in range(arity))
+        magic_rules.append((adorned(pattern, adorn),
+                            [magic(pattern, adorn), pattern]))
+
+        for head, premises in rules:
+            if head[0] != name or len(head) - 1 != arity:
+                continue
+
+            bound = {arg for arg, mode in zip(head[1:], adorn)
+                     if mode == "b" and is_variable(arg)}
+            body = [magic(head, adorn)]
+
+            for prem in premises:
+                if (prem[0], len(prem) - 1) in derived:
+                    prem_adorn = adornment(prem, bound)
+                    magic_rules.append((magic(prem, prem_adorn), list(body)))
+                    body.append(adorned(prem, prem_adorn))
+
+                    key = (prem[0], len(prem) - 1, prem_adorn)
+                    if key not in seen:
+                        seen.add(key)
+                        todo.append(key)
+                else:
+                    body.append(prem)
+                bound.update(arg for arg in prem[1:] if is_variable(arg))
+
+            magic_rules.append((adorned(head, adorn), body))
+
+    return magic_rules, magic(query, query_adorn), adorned(query, query_adorn)
+
+
+def magic_query(rules, facts, query):
+    """Return the facts matching query, derived bottom-up from magic rules."""
+    magic_rules, seed, goal = magic_sets_rewrite(rules, query)
+
+    return {(query[0],) + fact[1:]
+            for fact in derive(magic_rules, [seed] + list(facts))
+            if fact[0] == goal[0] and unify(goal, fact) is not None}
+
+
+def magic_forward_chain(rules, facts, query):
+    """Forward chaining restricted to the facts relevant to query."""
+    answers = magic_query(rules, facts, query)
+    for answer in sorted(answers):
+        print(f"Derived answer: {answer}")
+
+    if answers:
+        print("\nQuery proven by forward chaining!")
+        return True
+
+    print("\nQuery NOT provable from given KB.")
+    return False
+
+
+class MaterializedKB:
+    """Materialised fixpoint of rules over base facts, maintained incrementally.
+
+    assert_fact propagates a new base fact semi-naively. retract_fact uses
+    delete-and-rederive (DRed): it over-deletes every fact with a derivation
+    through the retracted one, puts back the over-deleted facts that are
+    still base facts or have a one-step derivation from the surviving facts,
+    and propagates those re-insertions. Both only touch the derivations
+    affected by the change.
+    """
+
+    def __init__(self, rules, facts=()):
+        self.rules = rules
+        self.base = set()
+        self.known = FactStore()
+        # Heads of rules without premises hold whatever the base facts are.
+        self._insert([head for head, premises in rules if not premises])
+        self.assert_facts(facts)
+
+    def assert_fact(self, fact):
+        """Add a base fact; return the set of facts that became known."""
+        self.base.add(fact)
+        return self._insert([fact])
+
+    def assert_facts(self, facts):
+        facts = list(facts)
+        self.base.update(facts)
+        return self._insert(facts)
+
+    def retract_fact(self, fact):
+        """Remove a base fact; return the set of facts no longer known."""
+        if fact not in self.base:
+            return set()
+        self.base.discard(fact)
+
+        # Over-delete: everything with a derivation that uses a deleted fact.
+        deleted = FactStore([fact])
+        delta = FactStore([fact])
+        while delta:
+            new = FactStore()
+            for head, premises in self.rules:
+                for i in range(len(premises)):
+                    sources = [(self.known,)] * len(premises)
+                    sources[i] = (delta,)
+                    order = plan_premises(premises, sources)
+                    for subst in match_premises([premises[j] for j in order],
+                                                [sources[j] for j in order]):
+                        new_fact = substitute(head, subst)
+                        if new_fact in self.known and new_fact not in deleted:
+                            new.add(new_fact)
+            deleted.update(new)
+            delta = new
+
+        for old_fact in deleted:
+            self.known.discard(old_fact)
+
+        # Re-derive what still holds, then propagate it forwards.
+        rederived = [f for f in deleted if f in self.base or self._derivable(f)]
+        return set(deleted) - self._insert(rederived)
+
+    def _derivable(self, fact):
+        """True if some rule derives fact in one step from the known facts;
+        always so for the head of a rule without premises."""
+        for head, premises in self.rules:
+            subst = unify(head, fact)
+            if subst is not None and match_premises(
+                    premises, [(self.known,)] * len(premises), subst):
+                return True
+        return False
+
+    def _insert(self, facts):
+        """Add facts semi-naively with their consequences; return what was added."""
+        delta = FactStore(f for f in facts if f not in self.known)
+        added = set(delta)
+
+        while delta:
+            new = FactStore()
+            for head, premises in self.rules:
+                for i in range(len(premises)):
+                    for subst in delta_join(premises, i, self.known, delta):
+                        new_fact = substitute(head, subst)
+                        if new_fact not in self.known and new_fact not in delta:
+                            new.add(new_fact)
+            self.known.update(delta)
+            added.update(new)
+            delta = new
+
+        return added
+
+
+def _round_worker(rules, old, connection):
+    """Worker process: keeps its own copy of the old facts across rounds.
+
+    Each message is one round's delta facts and this worker's share of its
+    (rule, delta position) joins, or None for no joins, when the round ran
+    in the parent and the worker only has to catch up.
+    """
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        delta, tasks = message
+        delta = FactStore(delta)
+        if tasks is not None:
+            connection.send([substitute(rules[r][0], subst) for r, i in tasks
+                             for subst in delta_join(rules[r][1], i, old, delta)])
+        old.update(delta)
+
+
+def parallel_forward_chain(rules, facts, query, processes=None, min_delta=1000):
+    """Semi-naive forward chaining with each round's joins run on worker processes.
+
+    Every (rule, delta position) join of a round is an independent task. One
+    set of at most cpu_count() workers serves the whole fixpoint: they start
+    with a copy of the old facts and afterwards only receive each round's
+    delta, and the derived facts are merged at the end of the round. Rounds
+    whose delta has fewer than min_delta facts run in this process, as
+    shipping them would cost more than the joins.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    processes = min(processes or multiprocessing.cpu_count(),
+                    multiprocessing.cpu_count())
+
+    old = FactStore()
+    delta = FactStore(facts)
+    for head, premises in rules:
+        if not premises and delta.add(head):
+            print(f"Derived new fact: {head}")
+    workers = []
+
+    if query in delta:
+        print("\nQuery proven by forward chaining!")
+        return True
+
+    try:
+        while delta:
+            # Only joins whose delta premise has new facts can derive anything.
+            tasks = [(r, i) for r, (head, premises) in enumerate(rules)
+                     for i, prem in enumerate(premises)
+                     if delta.by_pred.get((prem[0], len(prem) - 1))]
+            batch = list(delta)
+
+            if processes < 2 or len(tasks) < 2 or len(delta) < min_delta:
+                derived = [[substitute(rules[r][0], subst)
+                            for subst in delta_join(rules[r][1], i, old, delta)]
+                           for r, i in tasks]
+                for _, connection in workers:
+                    connection.send((batch, None))
+            else:
+                if not workers:
+                    for _ in range(processes):
+                        parent_end, child_end = context.Pipe()
+                        worker = context.Process(target=_round_worker,
+                                                 args=(rules, old, child_end),
+                                                 daemon=True)
+                        worker.start()
+                        child_end.close()
+                        workers.append((worker, parent_end))
+                for w, (_, connection) in enumerate(workers):
+                    connection.send((batch, tasks[w::len(workers)]))
+                derived = (connection.recv() for _, connection in workers)
+
+            new = FactStore()
+            for new_facts in derived:
+                for new_fact in new_facts:
+                    if new_fact in old or new_fact in delta or not new.add(new_fact):
+                        continue
+                    print(f"Derived new fact: {new_fact}")
+
+                    if new_fact == query:
+                        print("\nQuery proven by forward chaining!")
+                        return True
+
+            old.update(delta)
+            delta = new
+    finally:
+        for worker, connection in workers:
+            worker.terminate()
+            worker.join()
+            connection.close()
+
+    print("\nQuery NOT provable from given KB.")
+    return False
+
+
+if __name__ == "__main__":
+    # Run forward chaining
+    forward_chain(rules, facts, query)
+
+    print("\n--- Semi-naive evaluation ---")
+    semi_naive_forward_chain(rules, facts, query)
+
+    print("\n--- Rete network ---")
+    rete_forward_chain(rules, facts, query)
+
+    print("\n--- Tabled backward chaining ---")
+    backward_chain(rules, facts, query)
+
+    print("\n--- Magic-sets forward chaining ---")
+    magic_forward_chain(rules, facts, query)
+
+    print("\n--- Parallel semi-naive evaluation ---")
+    parallel_forward_chain(rules, facts, query, processes=2)
+
+    print("\n--- Streaming derivation with provenance ---")
+    dump_facts(derive(rules, facts, provenance=True), sys.stdout)
+
+    print("\n--- Incremental maintenance ---")
+    kb = MaterializedKB(rules, facts)
+    for removed in sorted(kb.retract_fact(("Father", "John", "Mary"))):
+        print(f"Retracted fact: {removed}")
+    print("Query still known:", query in kb.known)
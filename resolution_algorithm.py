@@ -1,4 +1,147 @@
-from copy import deepcopy
+import heapq
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import re
+import sys
+import time
+import weakref
+from collections import defaultdict, deque
+
+# ---------- Terms and Literals ----------
+
+class Term:
+    """Function term name(args), interned: equal terms are one object.
+
+    Variables (lowercase) and constants are plain interned strings; args is
+    a tuple of terms.
+    """
+    __slots__ = ("__weakref__", "name", "args")
+    _table = weakref.WeakValueDictionary()
+
+    def __new__(cls, name, args):
+        key = (name, args)
+        term = Term._table.get(key)
+        if term is None:
+            term = object.__new__(cls)
+            term.name, term.args = name, args
+            Term._table[key] = term
+        return term
+
+    def __reduce__(self):
+        return (Term, (self.name, self.args))
+
+    def __repr__(self):
+        parts, stack = [], [self]
+        while stack:
+            t = stack.pop()
+            if isinstance(t, Term):
+                parts.append(t.name + "(")
+                stack.append(")")
+                for k in range(len(t.args) - 1, -1, -1):
+                    stack.append(t.args[k])
+                    if k:
+                        stack.append(",")
+            else:
+                parts.append(t)
+        return "".join(parts)
+
+    __str__ = __repr__
+
+
+class Literal:
+    """Literal (sign, predicate, argument terms), interned like Term.
+
+    Clauses are frozensets of literals; since equal literals are one object,
+    hashing and comparing them never looks at their arguments.
+    """
+    __slots__ = ("__weakref__", "positive", "pred", "args")
+    _table = weakref.WeakValueDictionary()
+
+    def __new__(cls, positive, pred, args):
+        key = (positive, pred, args)
+        literal = Literal._table.get(key)
+        if literal is None:
+            literal = object.__new__(cls)
+            literal.positive, literal.pred, literal.args = key
+            Literal._table[key] = literal
+        return literal
+
+    def __reduce__(self):
+        return (Literal, (self.positive, self.pred, self.args))
+
+    def __repr__(self):
+        atom = f"{self.pred}({','.join(map(str, self.args))})" if self.args else self.pred
+        return atom if self.positive else "~" + atom
+
+    __str__ = __repr__
+
+
+_TOKEN = re.compile(r"\s*([A-Za-z0-9_']+|\S)")
+
+
+def parse_terms(tokens, i):
+    """Parse the comma-separated terms after the "(" at tokens[i].
+
+    Returns the tuple of terms and the index just past the matching ")".
+    Each "name(" pushes a fresh argument list that its ")" folds into a
+    Term, so nesting depth is not bounded by the recursion limit.
+    """
+    lists, names = [[]], []
+    i += 1
+    while True:
+        token = tokens[i] if i < len(tokens) else ""
+        if token == ")" and not lists[-1]:          # f()
+            pass
+        elif not token or not (token[0].isalnum() or token[0] == "_"):
+            raise ValueError(f"expected a term, got {token!r}")
+        elif i + 1 < len(tokens) and tokens[i + 1] == "(":
+            names.append(sys.intern(token))
+            lists.append([])
+            i += 2
+            continue
+        else:
+            lists[-1].append(sys.intern(token))
+            i += 1
+
+        while i < len(tokens) and tokens[i] == ")":
+            args = tuple(lists.pop())
+            i += 1
+            if not names:
+                return args, i
+            lists[-1].append(Term(names.pop(), args))
+        if i >= len(tokens) or tokens[i] != ",":
+            raise ValueError("expected ',' or ')' in argument list")
+        i += 1
+
+
+def parse_predicate(pred):
+    """Split predicate into name and argument terms."""
+    tokens = _TOKEN.findall(pred)
+    if not tokens:
+        raise ValueError("empty predicate")
+    args, i = (), 1
+    if len(tokens) > 1 and tokens[1] == "(":
+        args, i = parse_terms(tokens, 1)
+    if i != len(tokens):
+        raise ValueError(f"unexpected {tokens[i]!r} in {pred!r}")
+    return sys.intern(tokens[0]), args
+
+
+def parse_literal(literal):
+    """Literal for a string such as "~Loves(x, mother(x))"."""
+    if isinstance(literal, Literal):
+        return literal
+    text = literal.strip()
+    positive = True
+    while text.startswith("~"):
+        positive, text = not positive, text[1:].lstrip()
+    return Literal(positive, *parse_predicate(text))
+
+
+def parse_clause(clause):
+    """Clause (frozenset of Literals) for a list of literal strings."""
+    return frozenset(map(parse_literal, clause))
 
 # ---------- Utility Functions ----------
 
@@ -6,135 +149,944 @@ def is_variable(x):
     """Return True if x is a variable (lowercase string)."""
     return isinstance(x, str) and x[0].islower()
 
+def _rebuild(term, subs, follow):
+    """term (or tuple of terms) with the variables in subs replaced by their
+    values, which with follow are substituted into in turn.
+
+    Uses an explicit stack, like every walk over terms in this module, so
+    deeply nested terms cannot raise RecursionError.
+    """
+    results = []
+    stack = [(term, False)]
+    while stack:
+        t, built = stack.pop()
+        if built:
+            n = len(t.args) if isinstance(t, Term) else len(t)
+            args = tuple(results[len(results) - n:])
+            del results[len(results) - n:]
+            results.append(Term(t.name, args) if isinstance(t, Term) else args)
+        elif isinstance(t, Term):
+            stack.append((t, True))
+            stack.extend((a, False) for a in reversed(t.args))
+        elif isinstance(t, tuple):
+            stack.append((t, True))
+            stack.extend((a, False) for a in reversed(t))
+        elif is_variable(t) and t in subs:
+            if follow:
+                stack.append((subs[t], False))
+            else:
+                results.append(subs[t])
+        else:
+            results.append(t)
+    return results[0]
+
 def substitute(term, subs):
-    """Apply substitution dictionary subs to a term."""
-    if isinstance(term, list):
-        return [substitute(t, subs) for t in term]
-    elif is_variable(term):
-        return subs.get(term, term)
-    return term
+    """Apply substitution dictionary subs to a term, following bound variables."""
+    return _rebuild(term, subs, True) if subs else term
 
 def unify(x, y, subs=None):
-    """Unify two terms with substitution subs."""
-    if subs is None:
-        subs = {}
-    if x == y:
-        return subs
-    elif is_variable(x):
-        return unify_var(x, y, subs)
-    elif is_variable(y):
-        return unify_var(y, x, subs)
-    elif isinstance(x, list) and isinstance(y, list) and len(x) == len(y):
-        for xi, yi in zip(x, y):
-            subs = unify(xi, yi, subs)
-            if subs is None:
+    """Unify two terms with substitution subs; returns a new dict or None."""
+    subs = dict(subs) if subs else {}
+    stack = [(x, y)]
+    while stack:
+        x, y = stack.pop()
+        while is_variable(x) and x in subs:
+            x = subs[x]
+        while is_variable(y) and y in subs:
+            y = subs[y]
+        if x is y or x == y:
+            continue
+        elif is_variable(x) or is_variable(y):
+            var, value = (x, y) if is_variable(x) else (y, x)
+            if occurs_check(var, value, subs):
                 return None
-        return subs
-    else:
-        return None
+            subs[var] = value
+        elif isinstance(x, Term) and isinstance(y, Term):
+            if x.name != y.name or len(x.args) != len(y.args):
+                return None
+            stack.extend(zip(x.args, y.args))
+        elif isinstance(x, tuple) and isinstance(y, tuple) and len(x) == len(y):
+            stack.extend(zip(x, y))
+        else:
+            return None
+    return subs
 
 def unify_var(var, x, subs):
-    if var in subs:
-        return unify(subs[var], x, subs)
-    elif x in subs:
-        return unify(var, subs[x], subs)
-    elif occurs_check(var, x, subs):
-        return None
-    else:
-        new_subs = deepcopy(subs)
-        new_subs[var] = x
-        return new_subs
+    return unify(var, x, subs)
 
 def occurs_check(var, x, subs):
     """Avoid recursive references."""
-    if var == x:
-        return True
-    elif is_variable(x) and x in subs:
-        return occurs_check(var, subs[x], subs)
-    elif isinstance(x, list):
-        return any(occurs_check(var, xi, subs) for xi in x)
+    stack = [x]
+    while stack:
+        x = stack.pop()
+        if var == x:
+            return True
+        elif is_variable(x) and x in subs:
+            stack.append(subs[x])
+        elif isinstance(x, Term):
+            stack.extend(x.args)
     return False
 
 # ---------- Resolution ----------
 
 def negate(literal):
-    """Negate a literal string."""
+    """Negate a literal (a Literal, or a literal string)."""
+    if isinstance(literal, Literal):
+        return Literal(not literal.positive, literal.pred, literal.args)
     if literal.startswith("~"):
         return literal[1:]
     else:
         return "~" + literal
 
-def parse_predicate(pred):
-    """Split predicate into name and arguments."""
-    name, args = pred.split("(")
-    args = args.strip(")").split(",")
-    return name.strip(), [a.strip() for a in args]
-
 def apply_subs_to_clause(clause, subs):
     """Apply substitution to all literals in a clause."""
-    new_clause = []
+    return [Literal(lit.positive, lit.pred, substitute(lit.args, subs))
+            for lit in clause]
+
+def term_vars(term, found):
+    """Add the variables of term (a term or tuple of terms) to the set found."""
+    stack = [term]
+    while stack:
+        t = stack.pop()
+        if isinstance(t, tuple):
+            stack.extend(t)
+        elif isinstance(t, Term):
+            stack.extend(t.args)
+        elif is_variable(t):
+            found.add(t)
+    return found
+
+def clause_vars(clause):
+    found = set()
     for lit in clause:
-        neg = lit.startswith("~")
-        pred = lit[1:] if neg else lit
-        name, args = parse_predicate(pred)
-        new_args = substitute(args, subs)
-        new_clause.append(("~" if neg else "") + name + "(" + ",".join(new_args) + ")")
-    return new_clause
-
-def resolve(ci, cj):
-    """Try to resolve two clauses (FOL version)."""
+        term_vars(lit.args, found)
+    return found
+
+_fresh = itertools.count()
+
+def standardize_apart(clause, taken=None):
+    """clause with its variables renamed: those in the set taken, or all."""
+    clash = clause_vars(clause)
+    if taken is not None:
+        clash &= taken
+    if not clash:
+        return clause
+    subs = {v: sys.intern(v.split("'")[0] + f"'{next(_fresh)}") for v in clash}
+    return frozenset(apply_subs_to_clause(clause, subs))
+
+def rename_vars(term, names):
+    """term with each variable v in names replaced by names[v]; unlike
+    substitute, the new names are not looked up again."""
+    return _rebuild(term, names, False)
+
+def _shape(literal):
+    """Sort key of a literal that ignores the names of its variables."""
+    return tuple(() if s is None else (s,) if type(s) is str else s
+                 for s in flatten(literal))
+
+def canonical(clause):
+    """clause with its variables renamed x, y, z, x3, x4, ... in order of
+    first occurrence, reading the literals sorted by _shape.
+
+    Variants of a clause, such as resolvents renamed apart, then mostly
+    become the same clause, so exact duplicate checks catch them.
+    """
+    names = {}
+    for lit in sorted(clause, key=_shape):
+        for t in _preorder(lit.args):
+            if is_variable(t) and t not in names:
+                n = len(names)
+                names[t] = sys.intern("xyz"[n] if n < 3 else f"x{n}")
+    if all(old == new for old, new in names.items()):
+        return clause
+    return frozenset(Literal(lit.positive, lit.pred, rename_vars(lit.args, names))
+                     for lit in clause)
+
+def _preorder(args):
+    """The terms of args and all their subterms, in preorder."""
+    stack = list(reversed(args))
+    while stack:
+        t = stack.pop()
+        yield t
+        if isinstance(t, Term):
+            stack.extend(reversed(t.args))
+
+def maximal_literals(clause):
+    """Literals of clause whose predicate comes last in name order.
+
+    Ordering atoms by predicate alone is stable under substitution, so
+    resolving only upon these literals keeps resolution complete.
+    """
+    last = max(lit.pred for lit in clause)
+    return [lit for lit in clause if lit.pred == last]
+
+def selected_literals(clause):
+    """The largest negative literal of clause if it has one, else its
+    maximal literals (ordered resolution with negative selection)."""
+    negatives = [lit for lit in clause if not lit.positive]
+    if negatives:
+        return [max(negatives, key=lambda lit: (len(flatten(lit)), str(lit)))]
+    return maximal_literals(clause)
+
+ELIGIBLE = {"all": None, "maximal": maximal_literals, "selected": selected_literals}
+
+def resolve(ci, cj, eligible=None):
+    """Try to resolve two clauses (FOL version).
+
+    cj is renamed apart from ci first; literals are only unified when they
+    have opposite signs and the same predicate and arity. eligible, if
+    given, maps a clause to the literals it may be resolved upon.
+    """
     resolvents = []
-    for di in ci:
-        for dj in cj:
-            neg_di = negate(di)
-            name1, args1 = parse_predicate(di if not di.startswith("~") else di[1:])
-            name2, args2 = parse_predicate(dj if not dj.startswith("~") else dj[1:])
-            if negate(di).split("(")[0] == dj.split("(")[0]:  # same predicate
-                subs = unify(args1, args2, {})
+    cj = standardize_apart(cj, clause_vars(ci))
+    for di in (eligible(ci) if eligible else ci):
+        for dj in (eligible(cj) if eligible else cj):
+            if di.positive != dj.positive and di.pred is dj.pred \
+                    and len(di.args) == len(dj.args):
+                subs = unify(di.args, dj.args, {})
                 if subs is not None:
-                    new_clause = list(set(apply_subs_to_clause(
-                        [x for x in ci if x != di] + [x for x in cj if x != dj],
-                        subs)))
+                    new_clause = frozenset(apply_subs_to_clause(
+                        [x for x in ci if x is not di] + [x for x in cj if x is not dj],
+                        subs))
                     resolvents.append(new_clause)
     return resolvents
 
-def resolution(kb, query):
-    """Main resolution refutation loop."""
-    clauses = deepcopy(kb)
-    clauses.append([negate(query)])
-    new = []
+def factors(clause):
+    """Clause with the unifier applied, for each two literals of the same sign
+    and predicate that unify. Binary resolution needs these to be complete."""
+    lits = list(clause)
+    result = []
+    for i, a in enumerate(lits):
+        for b in lits[i + 1:]:
+            if a.positive == b.positive and a.pred is b.pred \
+                    and len(a.args) == len(b.args):
+                subs = unify(a.args, b.args, {})
+                if subs is not None:
+                    result.append(frozenset(apply_subs_to_clause(clause, subs)))
+    return result
 
-    print("Initial clauses:")
-    for c in clauses:
-        print("  ", c)
+def term_depth(term):
+    """Nesting depth of function terms in term: 0 for variables and constants."""
+    deepest = 0
+    stack = [(term, 0)]
+    while stack:
+        t, depth = stack.pop()
+        if isinstance(t, tuple):
+            stack.extend((a, depth) for a in t)
+        elif isinstance(t, Term):
+            deepest = max(deepest, depth + 1)
+            stack.extend((a, depth + 1) for a in t.args)
+    return deepest
 
-    while True:
-        pairs = [(clauses[i], clauses[j]) for i in range(len(clauses))
-                 for j in range(i + 1, len(clauses))]
-        for (ci, cj) in pairs:
-            resolvents = resolve(ci, cj)
-            for r in resolvents:
-                if [] in r or r == []:
-                    print("\nDerived empty clause: contradiction found!")
-                    return True
-                if r not in clauses and r not in new:
-                    new.append(r)
-        if not new:
-            print("\nNo new clauses — cannot prove.")
+def literal_key(literal):
+    """(polarity, predicate name) of a literal."""
+    return (literal.positive, literal.pred)
+
+
+# ---------- Subsumption and Simplification ----------
+
+def match(pattern, term, subs):
+    """One-way unification: extend subs so that pattern/subs == term, or None.
+
+    Only variables of pattern are bound; those of term are treated as
+    constants, so the two need not be standardized apart. subs itself is
+    never modified.
+    """
+    copied = False
+    stack = [(pattern, term)]
+    while stack:
+        pattern, term = stack.pop()
+        if isinstance(pattern, tuple):
+            if not isinstance(term, tuple) or len(pattern) != len(term):
+                return None
+            stack.extend(zip(pattern, term))
+        elif isinstance(pattern, Term):
+            if not isinstance(term, Term) or pattern.name != term.name \
+                    or len(pattern.args) != len(term.args):
+                return None
+            stack.extend(zip(pattern.args, term.args))
+        elif is_variable(pattern):
+            if pattern in subs:
+                if subs[pattern] != term:
+                    return None
+            else:
+                if not copied:
+                    subs, copied = dict(subs), True
+                subs[pattern] = term
+        elif pattern != term:
+            return None
+    return subs
+
+def subsumes(c, d):
+    """True if some substitution maps every literal of clause c into clause d.
+
+    c must not be longer than d: otherwise a clause would subsume its own
+    factors, which resolution needs to keep.
+    """
+    if len(c) > len(d):
+        return False
+    candidates = defaultdict(list)
+    for lit in d:
+        candidates[literal_key(lit)].append(lit)
+    lits = sorted(c, key=lambda lit: len(candidates.get(literal_key(lit), ())))
+
+    if not lits:
+        return True
+
+    # Depth-first search over one matching target per literal of c.
+    stack = [({}, iter(candidates.get(literal_key(lits[0]), ())))]
+    while stack:
+        subs, targets = stack[-1]
+        i = len(stack) - 1
+        for target in targets:
+            new_subs = match(lits[i].args, target.args, subs)
+            if new_subs is None:
+                continue
+            if i + 1 == len(lits):
+                return True
+            stack.append((new_subs, iter(candidates.get(literal_key(lits[i + 1]), ()))))
+            break
+        else:
+            stack.pop()
+    return False
+
+def condense(clause):
+    """clause with the literals it has twice up to a substitution merged.
+
+    When matching one literal onto another maps the whole clause into a
+    proper subset of itself, that subset is equivalent to clause and
+    replaces it; {~P(x), ~P(y), Q(y)} condenses to {~P(y), Q(y)}.
+    """
+    shrunk = True
+    while shrunk and len(clause) > 1:
+        shrunk = False
+        for a, b in itertools.permutations(clause, 2):
+            if a.positive == b.positive and a.pred is b.pred \
+                    and len(a.args) == len(b.args):
+                subs = match(a.args, b.args, {})
+                if subs is None:
+                    continue
+                image = set()
+                for lit in clause:
+                    mapped = Literal(lit.positive, lit.pred,
+                                     rename_vars(lit.args, subs))
+                    if mapped not in clause:
+                        break
+                    image.add(mapped)
+                else:
+                    if len(image) < len(clause):
+                        clause, shrunk = frozenset(image), True
+                        break
+    return clause
+
+def is_tautology(clause):
+    """True if clause contains a literal and its negation."""
+    return any(negate(lit) in clause for lit in clause if lit.positive)
+
+def signature(clause):
+    """Bit set of the (polarity, predicate) keys of clause, hashed to 64 bits.
+
+    If c subsumes d, every key of c is a key of d, so
+    signature(c) & ~signature(d) == 0 rules most pairs out at once.
+    """
+    sig = 0
+    for lit in clause:
+        sig |= 1 << (hash(literal_key(lit)) & 63)
+    return sig
+
+def unit_simplify(clause, units, used=None):
+    """clause without the literals that a unit clause contradicts.
+
+    units is a DiscriminationTree of unit literals (with their clauses); a
+    literal is dropped when the complement of one of them generalizes it.
+    The unit clauses applied are appended to the list used, if given.
+    """
+    kept = []
+    for lit in clause:
+        unit = next(units.generalizations(negate(lit)), None)
+        if unit is None:
+            kept.append(lit)
+        elif used is not None:
+            used.append(next(iter(unit[1])))
+    return clause if len(kept) == len(clause) else frozenset(kept)
+
+
+# ---------- Term Indexing ----------
+
+def flatten(literal):
+    """Preorder symbols of literal: (sign, predicate, arity), then one symbol
+    per term: None for a variable, the name of a constant, (name, arity)
+    for a function term."""
+    symbols = [(literal.positive, literal.pred, len(literal.args))]
+    stack = list(reversed(literal.args))
+    while stack:
+        t = stack.pop()
+        if isinstance(t, Term):
+            symbols.append((t.name, len(t.args)))
+            stack.extend(reversed(t.args))
+        elif is_variable(t):
+            symbols.append(None)
+        else:
+            symbols.append(t)
+    return symbols
+
+def _arity(symbol):
+    return symbol[1] if type(symbol) is tuple else 0
+
+def _skip_term(node):
+    """Nodes reached from node by reading exactly one whole stored term."""
+    stack = [(node, 1)]
+    while stack:
+        node, need = stack.pop()
+        for symbol, child in node.items():
+            left = need - 1 + _arity(symbol)
+            if left:
+                stack.append((child, left))
+            else:
+                yield child
+
+
+class DiscriminationTree:
+    """Literals indexed by their flatten() symbol strings, each with values.
+
+    The tree is nested dicts keyed by symbols; the node reached by a whole
+    literal maps each stored literal with that string to {value: None}.
+    Retrieval walks the tree once with an explicit stack, letting a variable
+    on either side skip a whole term on the other, then confirms each
+    candidate: unifiable(), instances() and generalizations() return only
+    (literal, values) pairs that really stand in that relation to the query.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, literal, value):
+        node = self.root
+        for symbol in flatten(literal):
+            node = node.setdefault(symbol, {})
+        node.setdefault(literal, {})[value] = None
+
+    def remove(self, literal, value):
+        path, node = [], self.root
+        for symbol in flatten(literal):
+            path.append((node, symbol))
+            node = node.get(symbol)
+            if node is None:
+                return
+        values = node.get(literal)
+        if values is None or value not in values:
+            return
+        del values[value]
+        if not values:
+            del node[literal]
+        for parent, symbol in reversed(path):
+            if parent[symbol]:
+                break
+            del parent[symbol]
+
+    def _candidates(self, literal, query_skips, stored_skips):
+        query = flatten(literal)
+        ends = [0] * (len(query) + 1)
+        for i in range(len(query) - 1, 0, -1):
+            end = i + 1
+            for _ in range(_arity(query[i])):
+                end = ends[end]
+            ends[i] = end
+
+        node = self.root.get(query[0])
+        stack = [(node, 1)] if node is not None else []
+        while stack:
+            node, i = stack.pop()
+            if i == len(query):
+                yield from node.items()
+                continue
+            symbol = query[i]
+            if symbol is None and query_skips:
+                stack.extend((child, i + 1) for child in _skip_term(node))
+                continue
+            child = node.get(symbol)
+            if child is not None:
+                stack.append((child, i + 1))
+            if symbol is not None and stored_skips and None in node:
+                stack.append((node[None], ends[i]))
+
+    def generalizations(self, literal):
+        """Stored literals that match literal (literal is their instance)."""
+        for stored, values in self._candidates(literal, False, True):
+            if match(stored.args, literal.args, {}) is not None:
+                yield stored, values
+
+    def instances(self, literal):
+        """Stored literals that literal matches."""
+        for stored, values in self._candidates(literal, True, False):
+            if match(literal.args, stored.args, {}) is not None:
+                yield stored, values
+
+    def unifiable(self, literal):
+        """Stored literals that unify with literal once renamed apart from it."""
+        literal = next(iter(standardize_apart(frozenset([literal]))))
+        for stored, values in self._candidates(literal, True, True):
+            if unify(literal.args, stored.args, {}) is not None:
+                yield stored, values
+
+
+class ClauseStore:
+    """Clauses kept once each, with term indexes over their literals.
+
+    Clauses are frozensets of Literals, so a duplicate is found by one hash
+    lookup. literals is a DiscriminationTree from each literal to the
+    clauses containing it: partners() only returns clauses with a literal
+    that unifies with the complement of one of the given clause. Each clause
+    also has an anchor literal, indexed in anchors, and a signature, for
+    subsumer() (forward subsumption) and subsumed() (backward subsumption).
+    """
+
+    def __init__(self, clauses=()):
+        self.clauses = {}                   # clause -> (signature, anchor)
+        self.literals = DiscriminationTree()
+        self.anchors = DiscriminationTree()
+        for clause in clauses:
+            self.add(clause)
+
+    def __contains__(self, clause):
+        return clause in self.clauses
+
+    def __len__(self):
+        return len(self.clauses)
+
+    def __iter__(self):
+        return iter(self.clauses)
+
+    def add(self, clause):
+        """Store clause; False if it was already stored."""
+        if clause in self.clauses:
             return False
-        clauses.extend(new)
-        new.clear()
+        # The literal with the most symbols has the fewest generalizations.
+        anchor = max(clause, key=lambda lit: len(flatten(lit)), default=None)
+        self.clauses[clause] = (signature(clause), anchor)
+        for lit in clause:
+            self.literals.insert(lit, clause)
+        if anchor is not None:
+            self.anchors.insert(anchor, clause)
+        return True
+
+    def discard(self, clause):
+        entry = self.clauses.pop(clause, None)
+        if entry is not None:
+            for lit in clause:
+                self.literals.remove(lit, clause)
+            if entry[1] is not None:
+                self.anchors.remove(entry[1], clause)
+
+    def partners(self, clause):
+        """Stored clauses that may resolve with clause, each once."""
+        found = {}
+        for lit in clause:
+            for _, clauses in self.literals.unifiable(negate(lit)):
+                found.update(clauses)
+        return list(found)
+
+    def subsumer(self, clause):
+        """A stored clause that subsumes clause, or None.
+
+        The anchor of a subsumer generalizes some literal of clause.
+        """
+        if frozenset() in self.clauses:
+            return frozenset()
+        sig = signature(clause)
+        for lit in clause:
+            for _, clauses in self.anchors.generalizations(lit):
+                for other in clauses:
+                    if not self.clauses[other][0] & ~sig and subsumes(other, clause):
+                        return other
+        return None
+
+    def subsumed(self, clause):
+        """The stored clauses, other than clause itself, that clause subsumes.
+
+        Each contains an instance of the anchor of clause.
+        """
+        if not clause:
+            return [other for other in self.clauses if other]
+        sig = signature(clause)
+        anchor = max(clause, key=lambda lit: len(flatten(lit)))
+        found = {}
+        for _, clauses in self.literals.instances(anchor):
+            found.update(clauses)
+        return [other for other in found
+                if other is not clause and not sig & ~self.clauses[other][0]
+                and subsumes(clause, other)]
+
+
+class LimitReached(Exception):
+    """Raised inside the search loop when a resource limit is hit."""
+
+
+class Refuted(Exception):
+    """Raised inside the search loop when the empty clause is derived."""
+
+
+class ProofResult:
+    """Outcome of resolution().
+
+    status is "proved" (the empty clause was derived), "saturated" (every
+    clause was processed: the query does not follow; after a set-of-support
+    run only if the KB is satisfiable), "limit" (a limit in reason stopped
+    the search or discarded clauses, so nothing is known) or, for a
+    portfolio() run, "error" (reason is the exception it raised).
+    stats counts the work done and proof lists the derivation of the empty
+    clause as (clause, rule, parents) steps, parents before children;
+    portfolio() sets strategy. A result is true exactly when the query was
+    proved.
+    """
+
+    def __init__(self, status, reason, stats, proof):
+        self.status = status
+        self.reason = reason
+        self.stats = stats
+        self.proof = proof
+        self.strategy = None
+
+    def __bool__(self):
+        return self.status == "proved"
+
+    def __repr__(self):
+        return f"ProofResult({self.status!r}, {self.reason!r}, {self.stats!r})"
+
+    def format_proof(self):
+        """The proof as numbered lines, parents referred to by number."""
+        numbers = {}
+        lines = []
+        for i, (clause, rule, parents) in enumerate(self.proof, 1):
+            numbers[clause] = i
+            text = " ∨ ".join(sorted(map(str, clause))) or "□"
+            refs = ", ".join(str(numbers[p]) for p in parents)
+            lines.append(f"{i:>4}. {text}   [{rule}{' ' + refs if refs else ''}]")
+        return "\n".join(lines)
+
+
+def _proof_steps(origin, empty):
+    """Derivation of empty from origin (clause -> (rule, parents)), in order."""
+    steps, done, stack = [], set(), [(empty, False)]
+    while stack:
+        clause, expanded = stack.pop()
+        if clause in done:
+            continue
+        rule, parents = origin[clause]
+        if expanded:
+            done.add(clause)
+            steps.append((clause, rule, parents))
+        else:
+            stack.append((clause, True))
+            stack.extend((p, False) for p in parents if p not in done)
+    return steps
+
+
+def resolution(kb, query, set_of_support=False, simplify=True, order="unit",
+               eligible="all", max_seconds=None, max_clauses=None,
+               max_literals=None, max_depth=32, verbose=True):
+    """Main resolution refutation loop (given-clause algorithm).
+
+    Unprocessed clauses wait in a queue; each step takes one as the given
+    clause, moves it to the usable store and resolves it only against the
+    stored clauses its literal index pairs it with, so no pair is tried
+    twice. With set_of_support the KB starts out usable and only
+    the negated query is queued: every resolvent then descends from the
+    query, and clauses of the KB are never resolved with each other. This
+    is much faster, but complete only for a satisfiable KB, so it is off by
+    default. The factors of each clause that becomes usable are queued as
+    well, except that those of KB clauses under set_of_support become
+    usable at once.
+
+    order="unit" (the default) prefers short clauses (unit preference): the
+    given clause is the shortest queued one, except that every fifth is the
+    oldest, so no clause waits forever; order="fifo" always takes the
+    oldest. eligible="maximal" resolves only upon maximal literals (ordered
+    resolution) and eligible="selected" upon a selected negative literal
+    when there is one; see ELIGIBLE.
+
+    With simplify, every clause is first shortened by the unit clauses,
+    then dropped if it is a tautology or subsumed by a kept clause (forward
+    subsumption); otherwise it deletes the kept clauses it subsumes
+    (backward subsumption). Without it, only tautologies and exact
+    duplicates are dropped; every kept clause is condensed and given
+    canonical() variable names first, so this catches resolvents that are
+    variants of a kept clause.
+
+    The search stops after max_seconds of wall time or max_clauses
+    generated clauses; clauses with more than max_literals literals or
+    terms nested deeper than max_depth (32 unless None is passed) are
+    discarded and counted in stats["discarded"], so a search that would
+    build ever deeper terms ends with status "limit". Returns a ProofResult.
+    """
+    if order not in ("fifo", "unit"):
+        raise ValueError(f"unknown clause order: {order}")
+    if eligible not in ELIGIBLE:
+        raise ValueError(f"unknown literal eligibility: {eligible}")
+    eligible = ELIGIBLE[eligible]
+
+    start = time.monotonic()
+    deadline = start + max_seconds if max_seconds is not None else None
+    stats = dict.fromkeys(("given", "generated", "kept", "tautologies",
+                           "forward_subsumed", "backward_subsumed",
+                           "unit_simplified", "discarded"), 0)
+
+    clauses = [parse_clause(c) for c in kb]
+    goal = frozenset([negate(parse_literal(query))])
+
+    if verbose:
+        print("Initial clauses:")
+        for c in clauses + [goal]:
+            print("  ", sorted(map(str, c)))
+
+    kept = ClauseStore()        # every live clause, usable or queued
+    usable = ClauseStore()
+    units = DiscriminationTree()
+    origin = {}                 # clause -> (rule, parent clauses)
+
+    def keep(clause, rule, parents):
+        """clause, simplified and stored, or None if it is redundant."""
+        clause = canonical(condense(clause))
+        origin.setdefault(clause, (rule, parents))
+        if simplify:
+            used = []
+            simplified = unit_simplify(clause, units, used)
+            if simplified is not clause:
+                stats["unit_simplified"] += 1
+                origin.setdefault(simplified, ("unit", (clause,) + tuple(used)))
+                clause = simplified
+            if not clause:
+                return clause
+            if is_tautology(clause):
+                stats["tautologies"] += 1
+                return None
+            if kept.subsumer(clause) is not None:
+                stats["forward_subsumed"] += 1
+                return None
+            for old in kept.subsumed(clause):
+                stats["backward_subsumed"] += 1
+                kept.discard(old)
+                usable.discard(old)
+            if len(clause) == 1:
+                for lit in clause:
+                    units.insert(lit, clause)
+        elif is_tautology(clause):
+            stats["tautologies"] += 1
+            return None
+        elif clause in kept:
+            return None
+        kept.add(clause)
+        stats["kept"] += 1
+        return clause
+
+    queue = deque()
+    lightest = []               # heap of (length, n, clause) for order="unit"
+    tiebreak = itertools.count()
+    discarded_by = set()        # limits that threw clauses away
+
+    def enqueue(clause):
+        queue.append(clause)
+        if order == "unit":
+            heapq.heappush(lightest, (len(clause), next(tiebreak), clause))
+
+    def next_given():
+        """The next queued clause still kept and not yet processed, or None."""
+        while queue or lightest:
+            if lightest and (not queue or stats["given"] % 5 != 4):
+                clause = heapq.heappop(lightest)[2]
+            else:
+                clause = queue.popleft()
+            if clause in kept and clause not in usable:
+                return clause
+        return None
+
+    def derive(clause, rule, parents, supported=True):
+        """Keep and queue a new clause unless it is redundant or over a limit;
+        raises Refuted on the empty clause. A clause outside the set of
+        support (a factor of the KB) is made usable instead of queued."""
+        stats["generated"] += 1
+        if max_clauses is not None and stats["generated"] > max_clauses:
+            raise LimitReached("max_clauses")
+        if deadline is not None and time.monotonic() > deadline:
+            raise LimitReached("max_seconds")
+        if max_literals is not None and len(clause) > max_literals:
+            discarded_by.add("max_literals")
+        elif max_depth is not None and any(term_depth(lit.args) > max_depth
+                                           for lit in clause):
+            discarded_by.add("max_depth")
+        else:
+            clause = keep(clause, rule, parents)
+            if clause is not None:
+                if not clause:
+                    raise Refuted(clause)
+                if supported:
+                    enqueue(clause)
+                else:
+                    make_usable(clause, False)
+            return
+        stats["discarded"] += 1
+
+    def make_usable(clause, supported=True):
+        """Move clause to usable and derive its factors."""
+        usable.add(clause)
+        for f in factors(clause):
+            derive(f, "factor", (clause,), supported)
+
+    def search():
+        for c in clauses + [goal]:
+            is_goal = c is goal
+            c = keep(c, "negated query" if is_goal else "input", ())
+            if c is None:
+                continue
+            if not c:
+                raise Refuted(c)
+            if set_of_support and not is_goal:
+                make_usable(c, False)
+            else:
+                enqueue(c)
+
+        while True:
+            if deadline is not None and time.monotonic() > deadline:
+                raise LimitReached("max_seconds")
+            given = next_given()    # skips clauses subsumed while they waited
+            if given is None:
+                break
+            stats["given"] += 1
+            make_usable(given)
+            for partner in usable.partners(given):
+                for r in resolve(given, partner, eligible):
+                    derive(r, "resolve", (given, partner))
+
+    try:
+        search()
+        if discarded_by:
+            result = ProofResult("limit", ", ".join(sorted(discarded_by)), stats, [])
+        else:
+            result = ProofResult("saturated", None, stats, [])
+    except Refuted as refuted:
+        result = ProofResult("proved", None, stats, _proof_steps(origin, refuted.args[0]))
+    except LimitReached as limit:
+        result = ProofResult("limit", limit.args[0], stats, [])
+    stats["seconds"] = time.monotonic() - start
+
+    if verbose:
+        if result:
+            print("\nDerived empty clause: contradiction found!")
+        elif result.status == "saturated":
+            print("\nNo new clauses — cannot prove.")
+        else:
+            print(f"\nStopped by {result.reason} — cannot decide.")
+    return result
+
+# ---------- Portfolio ----------
+
+STRATEGIES = {
+    "set of support": dict(set_of_support=True, order="fifo"),
+    "unit preference": dict(set_of_support=True, order="unit"),
+    "ordered": dict(set_of_support=False, order="fifo", eligible="maximal"),
+    "selection": dict(set_of_support=False, order="unit", eligible="selected"),
+}
+
+
+def _run_strategy(connection, kb, query, options):
+    """Portfolio worker: one resolution() run, whose ProofResult is sent back
+    over connection. An exception is sent as an "error" result, so it only
+    fails this strategy."""
+    try:
+        result = resolution(kb, query, verbose=False, **options)
+    except Exception as exc:
+        result = ProofResult("error", repr(exc), {}, [])
+    connection.send(result)
+    connection.close()
+
+
+# Which undecided result portfolio() returns when no run decides.
+_FALLBACK_RANK = {"error": 0, "limit": 1, "saturated": 2}
+
+
+def portfolio(kb, query, strategies=None, **limits):
+    """Run several resolution() strategies at once, one process each.
+
+    strategies maps names to resolution() keyword arguments, or is a
+    collection of names from STRATEGIES (all of them by default); limits
+    are passed to every run. The first run that proves the query, or that
+    saturates without set of support, decides: the other runs are
+    terminated and its ProofResult is returned with the strategy name in
+    result.strategy. A set-of-support run can saturate on an inconsistent
+    KB, so its "saturated" does not decide. A run that raises or dies only
+    fails its own strategy. If no run decides, a set-of-support saturation
+    is returned before a limit and a limit before an error.
+    """
+    strategies = strategies or STRATEGIES
+    if not isinstance(strategies, dict):
+        strategies = {name: STRATEGIES[name] for name in strategies}
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+
+    runs = {}           # receiving end -> (name, complete, process)
+    try:
+        for name, options in strategies.items():
+            options = dict(options, **limits)
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run_strategy, daemon=True,
+                                      args=(sender, kb, query, options))
+            process.start()
+            sender.close()
+            runs[receiver] = (name, not options.get("set_of_support", False),
+                              process)
+
+        best = None
+        while runs:
+            for receiver in multiprocessing.connection.wait(list(runs)):
+                name, complete, process = runs.pop(receiver)
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    result = ProofResult(
+                        "error", f"exited with code {process.exitcode}", {}, [])
+                receiver.close()
+                process.join()
+                result.strategy = name
+                if result.status == "proved" or (result.status == "saturated"
+                                                 and complete):
+                    return result
+                if best is None or (_FALLBACK_RANK[result.status]
+                                    >= _FALLBACK_RANK[best.status]):
+                    best = result
+        return best
+    finally:
+        for receiver, (name, complete, process) in runs.items():
+            process.terminate()
+        for receiver, (name, complete, process) in runs.items():
+            process.join()
+            receiver.close()
+
 
 # ---------- Example KB ----------
 
-KB = [
-    ["Man(Marcus)"],
-    ["~Man(x)", "Human(x)"],
-    ["~Human(x)", "Mortal(x)"]
-]
+if __name__ == "__main__":
+    KB = [
+        ["Man(Marcus)"],
+        ["~Man(x)", "Human(x)"],
+        ["~Human(x)", "Mortal(x)"]
+    ]
+
+    query = "Mortal(Marcus)"
+
+    print("Proving:", query)
+    result = resolution(KB, query)
+    print("\nResult:", "Proved ✅" if result else "Not provable ❌")
+    print(result.format_proof())
+    print(result.stats)
 
-query = "Mortal(Marcus)"
+    # Non-theorem with a function symbol: saturation would never end.
+    result = resolution([["Nat(Zero)"], ["~Nat(x)", "Nat(s(x))"]], "Nat(Omega)",
+                        set_of_support=False, max_seconds=5, max_depth=8,
+                        verbose=False)
+    print("\nNat(Omega):", result.status, result.reason, result.stats)
 
-print("Proving:", query)
-result = resolution(KB, query)
-print("\nResult:", "Proved ✅" if result else "Not provable ❌")
+    result = portfolio(KB, query, max_seconds=10)
+    print("\nPortfolio:", result.status, "by", result.strategy)
@@ -0,0 +1,66 @@
+# ---------------------------------------------
+# Regression tests for fol_to_cnf
+# ---------------------------------------------
+
+import gc
+import random
+import weakref
+
+from fol_to_cnf import (And, Exists, ForAll, Func, Iff, Impl, Not, Or, Pred,
+                        SymbolTable, Var, cnf_clauses, fused_clauses,
+                        parse_formula, skolemize, substitute_vars, to_cnf)
+
+
+def test_substitution_renames_capturing_binder():
+    x, y = Var("x"), Var("y")
+    formula = ForAll(x, parse_formula("P(x, y)"))
+    result = substitute_vars(formula, {y: Func("f", [x])})
+    assert str(result) == "∀x_1.P(x_1,f(x))"
+
+
+def test_skolemization_with_shadowed_variable():
+    # Satisfiable: the inner ∃x must not capture the x of y's Skolem term.
+    formula = parse_formula("forall x. exists y. (Q(x,y) & exists x. ~Q(x,y))")
+    for miniscoping in (True, False):
+        cnf = to_cnf(formula, miniscoping=miniscoping, table=SymbolTable())
+        assert str(cnf) == "(Q(x,Sk0(x)) ∧ ¬Q(Sk1(x),Sk0(x)))"
+
+
+def _shadowing_formulas(count, seed=0):
+    """Random formulas whose quantifiers reuse the names x and y."""
+    rng = random.Random(seed)
+    names = [Var("x"), Var("y")]
+
+    def build(depth):
+        if depth == 0:
+            return Pred(rng.choice("PQ"), rng.sample(names, rng.randint(1, 2)))
+        kind = rng.choice("&|>=~AE")
+        if kind in "AE":
+            return (ForAll if kind == "A" else Exists)(rng.choice(names),
+                                                        build(depth - 1))
+        if kind == "~":
+            return Not(build(depth - 1))
+        op = {"&": And, "|": Or, ">": Impl, "=": Iff}[kind]
+        return op(build(depth - 1), build(depth - 1))
+
+    return [build(rng.randint(1, 5)) for _ in range(count)]
+
+
+def test_fused_matches_staged_with_shadowing():
+    formulas = [parse_formula("forall x. exists y. (Q(x,y) & exists x. ~Q(x,y))"),
+                parse_formula("forall x. exists y. forall x. P(x,y)")]
+    for formula in formulas + _shadowing_formulas(500):
+        staged = cnf_clauses(to_cnf(formula, miniscoping=False,
+                                    table=SymbolTable()))
+        assert fused_clauses(formula, SymbolTable()) == staged, str(formula)
+
+
+def test_skolem_cache_does_not_pin_formulas():
+    text = "forall x. exists y. Pinned(x,y)"
+    formula = parse_formula(text)
+    existential = weakref.ref(formula.body)
+    first = skolemize(formula)
+    assert skolemize(parse_formula(text)) is first     # shared while alive
+    del formula, first
+    gc.collect()
+    assert existential() is None
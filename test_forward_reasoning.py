@@ -0,0 +1,119 @@
+# ---------------------------------------------
+# Behaviour tests for forward_reasoning
+# ---------------------------------------------
+
+import random
+
+from forward_reasoning import (BackwardChainer, FactStore, MaterializedKB,
+                               ReteNetwork, magic_query, match_premises,
+                               substitute, unify)
+
+START_RULES = [
+    (("Start", "A"), []),
+    (("Reach", "x"), [("Start", "x")]),
+    (("Reach", "y"), [("Reach", "x"), ("Edge", "x", "y")]),
+]
+START_FACTS = [("Edge", "A", "B"), ("Edge", "B", "C")]
+START_CLOSURE = {("Start", "A"), ("Reach", "A"), ("Reach", "B"), ("Reach", "C"),
+                 ("Edge", "A", "B"), ("Edge", "B", "C")}
+
+
+def naive_closure(rules, facts):
+    """Fixpoint by re-running every rule over all known facts."""
+    known = FactStore(facts)
+    while True:
+        new = {substitute(head, subst) for head, premises in rules
+               for subst in match_premises(premises, [(known,)] * len(premises))}
+        if new <= known.facts:
+            return set(known)
+        known.update(new)
+
+
+def random_program(seed):
+    rng = random.Random(seed)
+    consts, preds = ["A", "B", "C", "D"], ["P", "Q", "R"]
+
+    def atom(variables):
+        return (rng.choice(preds),) + tuple(rng.choice(variables + ["A"])
+                                            for _ in range(2))
+
+    rules = []
+    for _ in range(4):
+        premises = [atom(["x", "y", "z"]) for _ in range(rng.randint(1, 3))]
+        bound = sorted({a for p in premises for a in p[1:] if a.islower()}) or ["A"]
+        rules.append(((rng.choice(preds), rng.choice(bound), rng.choice(bound)),
+                      premises))
+    facts = [(rng.choice(preds), rng.choice(consts), rng.choice(consts))
+             for _ in range(6)]
+    return rules, facts
+
+
+def test_rete_matches_naive_closure():
+    for seed in range(100):
+        rules, facts = random_program(seed)
+        network = ReteNetwork(rules)
+        network.assert_facts(facts)
+        assert set(network.facts) == naive_closure(rules, facts), seed
+
+
+def test_rete_fires_rules_without_premises():
+    network = ReteNetwork(START_RULES)
+    network.assert_facts(START_FACTS)
+    assert set(network.facts) == START_CLOSURE
+
+
+def test_materialized_kb_matches_naive_closure_after_retraction():
+    for seed in range(100):
+        rules, facts = random_program(seed)
+        kb = MaterializedKB(rules, facts)
+        assert set(kb.known) == naive_closure(rules, facts), seed
+        for fact in facts[:3]:
+            kb.retract_fact(fact)
+            facts = [f for f in facts if f != fact]
+            assert set(kb.known) == naive_closure(rules, facts), seed
+
+
+def test_materialized_kb_keeps_zero_premise_heads():
+    kb = MaterializedKB(START_RULES, START_FACTS)
+    assert set(kb.known) == START_CLOSURE
+    kb.retract_fact(("Edge", "B", "C"))
+    assert set(kb.known) == START_CLOSURE - {("Edge", "B", "C"), ("Reach", "C")}
+    kb.assert_fact(("Start", "A"))
+    kb.retract_fact(("Start", "A"))
+    assert ("Start", "A") in kb.known
+
+
+def matching(facts, query):
+    return {fact for fact in facts if unify(query, fact) is not None}
+
+
+QUERIES = [("P", "x", "y"), ("Q", "A", "y"), ("R", "x", "B"), ("P", "x", "x")]
+
+
+def test_backward_chainer_matches_naive_closure():
+    for seed in range(100):
+        rules, facts = random_program(seed)
+        closure = naive_closure(rules, facts)
+        prover = BackwardChainer(rules, facts)      # tables shared by queries
+        for query in QUERIES:
+            assert prover.ask(query) == matching(closure, query), (seed, query)
+        assert BackwardChainer(START_RULES, START_FACTS).ask(("Reach", "x")) == \
+            matching(START_CLOSURE, ("Reach", "x"))
+
+
+def test_backward_chainer_left_recursion():
+    chain = [("Parent", f"N{i}", f"N{i + 1}") for i in range(100)]
+    rules = [(("Anc", "x", "y"), [("Parent", "x", "y")]),
+             (("Anc", "x", "z"), [("Anc", "x", "y"), ("Parent", "y", "z")])]
+    answers = BackwardChainer(rules, chain).ask(("Anc", "x", "N100"))
+    assert answers == {("Anc", f"N{i}", "N100") for i in range(100)}
+
+
+def test_magic_query_matches_naive_closure():
+    for seed in range(100):
+        rules, facts = random_program(seed)
+        closure = naive_closure(rules, facts)
+        for query in QUERIES:
+            assert magic_query(rules, facts, query) == matching(closure, query), \
+                (seed, query)
+    assert magic_query(START_RULES, START_FACTS, ("Reach", "C")) == {("Reach", "C")}
@@ -0,0 +1,85 @@
+# ---------------------------------------------
+# Behaviour tests for resolution_algorithm
+# ---------------------------------------------
+
+import itertools
+import random
+
+from resolution_algorithm import STRATEGIES, portfolio, resolution
+
+ATOMS = [f"P{i}(A)" for i in range(4)]
+
+INCONSISTENT_KB = [["P(A)", "Q(A)"], ["~P(A)", "Q(A)"],
+                   ["P(A)", "~Q(A)"], ["~P(A)", "~Q(A)"]]
+
+MARCUS_KB = [["Man(Marcus)"], ["~Man(x)", "Human(x)"], ["~Human(x)", "Mortal(x)"]]
+
+
+def satisfiable(clauses):
+    """Truth-table check of ground clauses over ATOMS."""
+    for values in itertools.product([False, True], repeat=len(ATOMS)):
+        model = dict(zip(ATOMS, values))
+        if all(any(not model[lit[1:]] if lit[0] == "~" else model[lit]
+                   for lit in clause) for clause in clauses):
+            return True
+    return False
+
+
+def entails(kb, query):
+    return not satisfiable(kb + [["~" + query]])
+
+
+def random_kbs(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        kb = [[rng.choice(["", "~"]) + rng.choice(ATOMS)
+               for _ in range(rng.randint(1, 3))]
+              for _ in range(rng.randint(2, 7))]
+        yield kb, rng.choice(ATOMS)
+
+
+def test_default_resolution_matches_truth_tables():
+    for kb, query in random_kbs(300):
+        result = resolution(kb, query, verbose=False)
+        assert result.status in ("proved", "saturated")
+        assert bool(result) == entails(kb, query), (kb, query)
+
+
+def test_default_resolution_proves_anything_from_inconsistent_kb():
+    assert resolution(INCONSISTENT_KB, "R(B)", verbose=False)
+
+
+TRANSITIVITY_KB = [["~Anc(x,y)", "~Anc(y,z)", "Anc(x,z)"],
+                   ["Anc(A,B)"], ["Anc(B,C)"], ["Anc(C,D)"]]
+
+
+def test_transitivity_without_simplification():
+    for set_of_support in (False, True):
+        result = resolution(TRANSITIVITY_KB, "Anc(A,D)", simplify=False,
+                            set_of_support=set_of_support, max_seconds=10,
+                            verbose=False)
+        assert result.status == "proved"
+        assert result.stats["generated"] < 1000
+
+
+
+def test_portfolio_waits_for_a_complete_strategy_on_inconsistent_kb():
+    result = portfolio(INCONSISTENT_KB, "R(B)", max_seconds=30)
+    assert result.status == "proved"
+    assert not STRATEGIES[result.strategy].get("set_of_support", False)
+
+
+def test_portfolio_agrees_with_truth_tables():
+    for kb, query in random_kbs(20, seed=1):
+        result = portfolio(kb, query, ["set of support", "ordered"],
+                           max_seconds=30)
+        assert bool(result) == entails(kb, query), (kb, query)
+
+
+def test_portfolio_survives_a_failing_strategy():
+    strategies = {"broken": dict(order="no such order"),
+                  "set of support": STRATEGIES["set of support"]}
+    result = portfolio(MARCUS_KB, "Mortal(Marcus)", strategies)
+    assert result.status == "proved" and result.strategy == "set of support"
+    result = portfolio(MARCUS_KB, "Mortal(Marcus)", {"broken": dict(order="?")})
+    assert result.status == "error"